@@ -2,19 +2,42 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+from matplotlib.figure import Figure
+from matplotlib.cm import ScalarMappable
 import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import re
+import os
+import sys
+import glob
+import shutil
+import tempfile
+import hashlib
+import threading
+import time
 import warnings
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
 import json
-import folium
-from folium import plugins
-from folium import Element
-import branca.colormap as cm
-from streamlit_folium import st_folium
-import uuid
+import io
+import urllib.request
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import shapely
+import geopandas as gpd
+import shapely.geometry
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import streamlit.components.v1 as components
+try:
+    import duckdb
+except ImportError:
+    # Optional: large sources fall back to streaming through pyarrow
+    duckdb = None
 warnings.filterwarnings('ignore')
 
 # Set page config
@@ -60,380 +83,1334 @@ st.markdown("""
         width: 100% !important;
         height: 100% !important;
     }
+</style>
+""", unsafe_allow_html=True)
+
+# --- Concurrent Source Reads ---
+
+# Upper bound on concurrent file reads; the dataset volume may be network-mounted
+SOURCE_READ_WORKERS = 8
+
+def read_sources_concurrently(readers, max_workers=SOURCE_READ_WORKERS, script_ctx=None, report=True):
+    """Run independent read callables on a bounded thread pool and join the results
     
-    /* Folium map containers - enhanced styling */
-    .stFolium {
-        background-color: #25262d !important;
-        border-radius: 0.75rem !important;
-        overflow: hidden !important;
-        margin: 1rem 0 !important;
-        padding: 0 !important;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.2) !important;
-        border: none !important;
-    }
-    
-    /* Map iframe styling with perfect rounded corners */
-    .stFolium iframe {
-        border-radius: 0.75rem !important;
-        border: none !important;
-        margin: 0 !important;
-        padding: 0 !important;
-        width: 100% !important;
-        height: 100% !important;
-        background-color: #25262d !important;
-        outline: none !important;
-    }
-    
-    /* Enhanced leaflet container styling */
-    .leaflet-container {
-        background-color: #25262d !important;
-        border-radius: 0.75rem !important;
-        margin: 0 !important;
-        padding: 0 !important;
-        outline: none !important;
-        border: none !important;
-    }
-    
-    /* Force all leaflet panes to have dark background and prevent black squares */
-    .leaflet-pane, 
-    .leaflet-tile-pane, 
-    .leaflet-map-pane,
-    .leaflet-overlay-pane,
-    .leaflet-shadow-pane,
-    .leaflet-marker-pane,
-    .leaflet-tooltip-pane,
-    .leaflet-popup-pane {
-        background-color: #25262d !important;
-    }
-    
-    /* Hide any tile layers that might show black background */
-    .leaflet-tile-pane {
-        display: none !important;
-        visibility: hidden !important;
-    }
+    readers maps a source name to a zero-argument callable. Returns a dict of results
+    keyed by the same names; the first failing read re-raises its exception here.
+    """
+    def timed(reader):
+        start = time.perf_counter()
+        result = reader()
+        return result, time.perf_counter() - start
+    
+    # Worker threads need the script run context to use Streamlit caches and elements
+    initializer = (lambda: add_script_run_ctx(threading.current_thread(), script_ctx)) if script_ctx else None
+    results = {}
+    timings = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(readers))), initializer=initializer) as pool:
+        futures = {name: pool.submit(timed, reader) for name, reader in readers.items()}
+        for name, future in futures.items():
+            results[name], timings[name] = future.result()
+    
+    if report:
+        report_load_timings(timings)
+    return results
+
+def report_load_timings(timings):
+    """Print per-source read timings, slowest first"""
+    lines = [f"  {seconds * 1000:8.1f} ms  {name}" for name, seconds in sorted(timings.items(), key=lambda item: -item[1])]
+    print("Source read timings:\n" + "\n".join(lines))
+
+# --- Processed Data Snapshot ---
+
+DATASET_DIR = "dataset"
+SNAPSHOT_DIR = ".snapshot"
+# Bump when the processed table layout changes so stale snapshots are rebuilt
+SNAPSHOT_VERSION = 7
+HASH_BLOCK_BYTES = 1 << 20
+
+def update_file_hash(hasher, path):
+    """Feed a file into a hash in fixed-size blocks, so large sources are never read whole"""
+    with open(path, "rb") as f:
+        for block in iter(partial(f.read, HASH_BLOCK_BYTES), b""):
+            hasher.update(block)
+    return hasher
+
+def write_file_atomic(path, write):
+    """Call write(tmp_path) on a fresh temp file next to path, then move it into place
+
+    Each call gets its own temp file, so concurrent writers of the same path never touch each
+    other's partial output, and a reader only ever sees a complete file.
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f".{name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_text_file(text, path):
+    """Write a text file in one go"""
+    with open(path, "w") as f:
+        f.write(text)
+
+def write_binary_file(data, path):
+    """Write a binary file in one go"""
+    with open(path, "wb") as f:
+        f.write(data)
+
+def write_arrow_table(df, path):
+    """Write a DataFrame as an uncompressed Arrow IPC file, atomically"""
+    write_file_atomic(path, partial(feather.write_feather, df, compression="uncompressed"))
+
+def write_json_atomic(data, path):
+    """Write a small JSON manifest atomically"""
+    write_file_atomic(path, partial(write_text_file, json.dumps(data)))
+
+def write_snapshot_table(name, df, source_hash, snapshot_dir=SNAPSHOT_DIR):
+    """Write one processed table as an uncompressed Arrow IPC file plus its manifest"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    write_arrow_table(df, os.path.join(snapshot_dir, f"{name}.arrow"))
+    # Manifest is written last, so it only ever points at a complete table
+    write_json_atomic({"source_hash": source_hash}, os.path.join(snapshot_dir, f"{name}.json"))
+
+def read_snapshot_table(name, source_hash, snapshot_dir=SNAPSHOT_DIR):
+    """Memory-map a snapshot table if it was built from the same sources, else None"""
+    try:
+        with open(os.path.join(snapshot_dir, f"{name}.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("source_hash") != source_hash:
+            return None
+        return feather.read_table(os.path.join(snapshot_dir, f"{name}.arrow"), memory_map=True).to_pandas()
+    except (OSError, ValueError, KeyError):
+        return None
+
+def build_snapshot():
+    """Build step: build every province-level dataset and write the columnar snapshot"""
+    source_hash = compute_data_version()
+    for name, build in PROVINCE_DATASETS.items():
+        write_snapshot_table(name, build(), source_hash)
+    write_geometry_store(convert_province_geometry(), source_hash)
+    return source_hash
+
+# --- BPS Number Parsing ---
+
+# Cell values BPS uses for "no data"; these become NaN without being reported
+NA_MARKERS = ['', '-', '..', '...', '\u2026', 'nan', 'NaN', 'NA', 'n/a']
+
+def detect_number_format(values):
+    """Detect the numeric format of a column of strings: space, us, eu, comma or plain"""
+    if values.str.contains(r"\d\s+\d", regex=True).any():
+        return 'space'  # "2 294 901"
+    if values.str.contains(r"\d,\d{3}\.\d", regex=True).any():
+        return 'us'  # "1,368.50"
+    if values.str.contains(r"\d\.\d{3},\d", regex=True).any():
+        return 'eu'  # "1.368,50"
+    with_comma = values[values.str.contains(',', regex=False)]
+    if with_comma.empty:
+        return 'plain'
+    # A comma followed by anything other than exactly three digits can only be a decimal comma
+    if (~with_comma.str.contains(r"^-?\d{1,3}(?:,\d{3})+(?:\.\d+)?$", regex=True)).any():
+        return 'comma'  # "6,89"
+    return 'us'  # "1,368"
+
+def parse_bps_numbers(df, columns=None, source=None):
+    """Convert whole columns of BPS-formatted numbers to floats in one vectorized pass
     
-    /* Style leaflet controls to match dark theme */
-    .leaflet-control-attribution {
-        background-color: rgba(37, 38, 45, 0.9) !important;
-        color: white !important;
-        border-radius: 4px !important;
-        font-size: 10px !important;
-        border: none !important;
-    }
+    Returns the converted DataFrame and a report (column, row, value) of cells that
+    could not be parsed. Those cells become NaN.
+    """
+    df = df.copy()
+    if columns is None:
+        columns = df.columns
     
-    .leaflet-control-attribution a {
-        color: #ccc !important;
-    }
+    unparsed = []
+    for col in columns:
+        if col not in df.columns or pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        values = df[col].astype('string').str.strip()
+        is_na = values.isna() | values.isin(NA_MARKERS)
+        values = values.mask(is_na)
+        
+        number_format = detect_number_format(values.dropna())
+        if number_format == 'space':
+            values = values.str.replace(r"\s+", '', regex=True)
+        elif number_format == 'us':
+            values = values.str.replace(',', '', regex=False)
+        elif number_format == 'eu':
+            values = values.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+        elif number_format == 'comma':
+            values = values.str.replace(',', '.', regex=False)
+        
+        parsed = pd.to_numeric(values, errors='coerce').astype('float64')
+        failed = parsed.isna() & ~is_na
+        if failed.any():
+            unparsed.append(pd.DataFrame({'column': col, 'row': df.index[failed], 'value': df.loc[failed, col]}))
+        df[col] = parsed
+    
+    report = pd.concat(unparsed, ignore_index=True) if unparsed else pd.DataFrame(columns=['column', 'row', 'value'])
+    if not report.empty:
+        print(f"Unparsed numeric cells in {source or 'dataset'}:\n{report.to_string(index=False)}")
+    return df, report
+
+# --- Dataset Schemas ---
+
+# Every source file declares its expected header, dtypes, NA markers and renames,
+# so pd.read_csv skips type inference and a changed BPS release fails at load time.
+# 'parse' lists columns stored as formatted strings that go through parse_bps_numbers.
+DATASET_SCHEMAS = {
+    'gini_ratio': {
+        'file': "Gini Ratio Menurut Provinsi dan Daerah 2023.csv",
+        'columns': ['Provinsi', '2023'],
+        'dtype': {'Provinsi': 'category', '2023': 'float32'},
+        'rename': {'2023': 'gini_ratio_2023'},
+    },
+    'upah_gaji': {
+        'file': "Rata-rata Upah_Gaji Bersih Sebulan Buruh_Karyawan_Pegawai Menurut Provinsi dan Jenis Pekerjaan Utama, 2023.csv",
+        'columns': ['Provinsi', 'Unnamed: 1', 'Rata-rata Feb 2023', 'Rata-rata Aug 2023'],
+        'dtype': {'Provinsi': 'category', 'Unnamed: 1': 'float32', 'Rata-rata Feb 2023': 'string', 'Rata-rata Aug 2023': 'string'},
+        'parse': ['Rata-rata Feb 2023', 'Rata-rata Aug 2023'],
+        'drop': ['Unnamed: 1'],
+        'rename': {'Rata-rata Feb 2023': 'Pendapatan Februari', 'Rata-rata Aug 2023': 'Pendapatan Agustus'},
+    },
+    'penyelesaian_pendidikan': {
+        'file': "Tingkat Penyelesaian Pendidikan Menurut Jenjang Pendidikan dan Provinsi, 2021-2023.csv",
+        'columns': ['Provinsi', 'SD_2021', 'SD_2022', 'SD_2023', 'SMP_2021', 'SMP_2022', 'SMP_2023',
+                    'SMA_2021', 'SMA_2022', 'SMA_2023'],
+        # float64: the completion rates and the shares derived from them are shown as published
+        'dtype': defaultdict(lambda: 'float64', {'Provinsi': 'category'}),
+        'na_values': ['-'],
+    },
+    'penduduk': {
+        'file': "Penduduk.csv",
+        'columns': ['Provinsi', 'Jumlah Penduduk (Ribu)'],
+        'dtype': {'Provinsi': 'category', 'Jumlah Penduduk (Ribu)': 'float64'},
+        'rename': {'Jumlah Penduduk (Ribu)': 'Jumlah Penduduk'},
+    },
+    'tindak_pidana': {
+        # One file per published period, discovered by discover_crime_period_files()
+        'file': None,
+        'column_pattern': r"^(Kepolisian Daerah|Provinsi|\d{4})$",
+        'dtype': defaultdict(lambda: 'float32', {'Kepolisian Daerah': 'category', 'Provinsi': 'category'}),
+        'na_values': ['-'],
+    },
+    'tindak_pidana_kabupaten_bulanan': {
+        # Kabupaten/kota x month counts, discovered by discover_regency_crime_files(). These files
+        # can be far larger than memory, so they are only ever read through aggregate_csv().
+        'file': None,
+        'columns': ['Kode Wilayah', 'Kabupaten/Kota', 'Provinsi', 'Tahun', 'Bulan',
+                    'Jumlah Tindak Pidana', 'Jumlah Penduduk'],
+        'dtype': {'Kode Wilayah': 'string', 'Kabupaten/Kota': 'string', 'Provinsi': 'string', 'Tahun': 'int16',
+                  'Bulan': 'int8', 'Jumlah Tindak Pidana': 'float64', 'Jumlah Penduduk': 'float64'},
+        'na_values': ['-'],
+    },
+    'oc_index': {
+        # One file per edition (oc_index_YYYY.csv), discovered by discover_oc_index_files()
+        'file': None,
+        'sep': ';',
+        'decimal': ',',
+        'columns': ['Continent', 'Region', 'Country', 'Criminality'],
+        'dtype': {'Continent': 'category', 'Region': 'category', 'Country': 'string', 'Criminality': 'float32'},
+    },
+    'world_crime_rate': {
+        'file': "World Crime Rate.csv",
+        'sep': ';',
+        'columns': ['Country Name', 'Country Code'] + [str(year) for year in range(2016, 2024)],
+        'dtype': defaultdict(lambda: 'float32', {'Country Name': 'string', 'Country Code': 'category'}),
+        'na_values': ['..'],
+    },
+}
+
+def validate_columns(df, schema, source):
+    """Fail fast when a file's header no longer matches its declared schema"""
+    expected = schema.get('columns')
+    if expected is not None and list(df.columns) != expected:
+        missing = [col for col in expected if col not in df.columns]
+        unexpected = [col for col in df.columns if col not in expected]
+        raise ValueError(f"Schema drift in {source}: missing columns {missing}, unexpected columns {unexpected}")
+    pattern = schema.get('column_pattern')
+    if pattern is not None:
+        unexpected = [col for col in df.columns if not re.match(pattern, col)]
+        if unexpected:
+            raise ValueError(f"Schema drift in {source}: unexpected columns {unexpected}")
+
+def read_dataset(name, path=None, dataset_dir=DATASET_DIR):
+    """Read a source CSV with the dtypes, NA markers and renames declared in DATASET_SCHEMAS"""
+    schema = DATASET_SCHEMAS[name]
+    path = path or os.path.join(dataset_dir, schema['file'])
+    source = os.path.basename(path)
+    try:
+        df = pd.read_csv(
+            path,
+            sep=schema.get('sep', ','),
+            decimal=schema.get('decimal', '.'),
+            dtype=schema['dtype'],
+            na_values=schema.get('na_values'),
+            encoding='utf-8-sig'
+        )
+    except ValueError as e:
+        # A value that no longer fits its declared dtype is schema drift too
+        raise ValueError(f"Schema drift in {source}: {e}") from e
+    validate_columns(df, schema, source)
+    
+    if schema.get('parse'):
+        # Parsed columns are rupiah amounts in the millions, which float32 would round to the
+        # nearest 0.25, so they stay float64
+        df, _ = parse_bps_numbers(df, schema['parse'], source=source)
+    return df.drop(columns=schema.get('drop', [])).rename(columns=schema.get('rename', {}))
+
+# --- Out-of-Core Ingestion ---
+
+# Arrow block size for streamed CSV reads. The reader keeps a fixed readahead of blocks, so peak
+# memory scales with this setting, not with the file size
+INGEST_BLOCK_BYTES = 1 << 20
+# Memory cap for the embedded query engine when duckdb is installed
+INGEST_MEMORY_LIMIT = "512MB"
+
+ARROW_TYPES = {'string': pa.string(), 'category': pa.string(), 'float32': pa.float32(), 'float64': pa.float64(),
+               'int8': pa.int8(), 'int16': pa.int16(), 'int32': pa.int32(), 'int64': pa.int64()}
+DUCKDB_TYPES = {'string': 'VARCHAR', 'category': 'VARCHAR', 'float32': 'FLOAT', 'float64': 'DOUBLE',
+                'int8': 'TINYINT', 'int16': 'SMALLINT', 'int32': 'INTEGER', 'int64': 'BIGINT'}
+
+def read_dataset_header(name, path):
+    """Read only the header row of a source and check it against its schema"""
+    schema = DATASET_SCHEMAS[name]
+    header = pd.read_csv(path, sep=schema.get('sep', ','), nrows=0, encoding='utf-8-sig')
+    validate_columns(header, schema, os.path.basename(path))
+    return schema
+
+def aggregate_csv(name, path, keys, values):
+    """Sum value columns per key group without materialising the file
     
-    .leaflet-control-zoom {
-        border: none !important;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.3) !important;
-    }
+    With duckdb installed the projection, filter and GROUP BY run inside its engine under
+    INGEST_MEMORY_LIMIT; otherwise the file is streamed in Arrow blocks and partial sums
+    are folded into running totals. Either way memory is bounded by the number of groups.
+    """
+    schema = read_dataset_header(name, path)
+    if duckdb is not None:
+        df = aggregate_csv_duckdb(schema, path, keys, values)
+    else:
+        df = aggregate_csv_streaming(schema, path, keys, values)
+    return df.astype({col: schema['dtype'][col] for col in keys + values})
+
+def aggregate_csv_duckdb(schema, path, keys, values):
+    """Push the projection and aggregation for aggregate_csv() down to duckdb"""
+    def quote(identifier):
+        return '"' + identifier.replace('"', '""') + '"'
+    def literal(value):
+        return "'" + str(value).replace("'", "''") + "'"
+    
+    columns = ", ".join(f"{literal(col)}: {literal(DUCKDB_TYPES[schema['dtype'][col]])}" for col in schema['columns'])
+    null_markers = ", ".join(literal(marker) for marker in schema.get('na_values', []) + [''])
+    conditions = [f"{quote(col)} IS NOT NULL" for col in keys]
+    key_sql = ", ".join(quote(col) for col in keys)
+    query = (
+        f"SELECT {key_sql}, {', '.join(f'sum({quote(col)}) AS {quote(col)}' for col in values)} "
+        f"FROM read_csv({literal(path)}, header = true, delim = {literal(schema.get('sep', ','))}, "
+        f"nullstr = [{null_markers}], columns = {{{columns}}}) "
+        f"WHERE {' AND '.join(conditions)} GROUP BY {key_sql}"
+    )
+    with duckdb.connect() as con:
+        con.execute(f"SET memory_limit = {literal(INGEST_MEMORY_LIMIT)}")
+        return con.execute(query).df()
+
+def aggregate_csv_streaming(schema, path, keys, values):
+    """Stream the file in Arrow blocks for aggregate_csv(), keeping only running per-group sums"""
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=INGEST_BLOCK_BYTES),
+        parse_options=pa_csv.ParseOptions(delimiter=schema.get('sep', ',')),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=keys + values,
+            column_types={col: ARROW_TYPES[schema['dtype'][col]] for col in keys + values},
+            null_values=schema.get('na_values', []) + [''],
+            strings_can_be_null=True,
+        ),
+    )
     
-    .leaflet-control-zoom a {
-        background-color: #25262d !important;
-        color: white !important;
-        border: 1px solid #444 !important;
-        text-decoration: none !important;
-    }
+    def combine(tables):
+        totals = pa.concat_tables(tables).group_by(keys).aggregate([(col, 'sum') for col in values])
+        return totals.rename_columns([name.removesuffix('_sum') for name in totals.column_names])
+    
+    partials = []
+    for batch in reader:
+        partials.append(combine([pa.Table.from_batches([batch])]))
+        # Fold the per-block sums regularly so they never grow with the file
+        if len(partials) >= 64:
+            partials = [combine(partials)]
+    if not partials:
+        return pd.DataFrame(columns=keys + values)
+    return combine(partials).to_pandas().dropna(subset=keys)[keys + values]
+
+# --- Province Dimension ---
+
+# One row per province: (BPS code, canonical name, region, geometry ID in map/indonesia-prov.geojson, aliases).
+# Aliases are compared after upper-casing and stripping.
+PROVINCES = [
+    (11, 'ACEH', 'Sumatra', 32, []),
+    (12, 'SUMATERA UTARA', 'Sumatra', 24, []),
+    (13, 'SUMATERA BARAT', 'Sumatra', 26, []),
+    (14, 'RIAU', 'Sumatra', 19, []),
+    (15, 'JAMBI', 'Sumatra', 29, []),
+    (16, 'SUMATERA SELATAN', 'Sumatra', 28, []),
+    (17, 'BENGKULU', 'Sumatra', 31, []),
+    (18, 'LAMPUNG', 'Sumatra', 30, []),
+    (19, 'KEPULAUAN BANGKA BELITUNG', 'Sumatra', 25, ['KEP. BANGKA BELITUNG', 'BANGKA BELITUNG']),
+    (21, 'KEPULAUAN RIAU', 'Sumatra', 76, ['KEP. RIAU']),
+    (31, 'DKI JAKARTA', 'Jawa', 14, ['METRO JAYA', 'JAKARTA']),
+    (32, 'JAWA BARAT', 'Jawa', 15, []),
+    (33, 'JAWA TENGAH', 'Jawa', 6, []),
+    (34, 'DI YOGYAKARTA', 'Jawa', 5, ['D.I. YOGYAKARTA', 'DAERAH ISTIMEWA YOGYAKARTA']),
+    (35, 'JAWA TIMUR', 'Jawa', 8, []),
+    (36, 'BANTEN', 'Jawa', 7, []),
+    (51, 'BALI', 'Bali & Nusa Tenggara', 18, []),
+    (52, 'NUSA TENGGARA BARAT', 'Bali & Nusa Tenggara', 2, ['NTB']),
+    (53, 'NUSA TENGGARA TIMUR', 'Bali & Nusa Tenggara', 17, ['NTT']),
+    (61, 'KALIMANTAN BARAT', 'Kalimantan', 12, []),
+    (62, 'KALIMANTAN TENGAH', 'Kalimantan', 27, []),
+    (63, 'KALIMANTAN SELATAN', 'Kalimantan', 11, []),
+    (64, 'KALIMANTAN TIMUR', 'Kalimantan', 21, []),
+    (65, 'KALIMANTAN UTARA', 'Kalimantan', 33, []),
+    (71, 'SULAWESI UTARA', 'Sulawesi', 22, []),
+    (72, 'SULAWESI TENGAH', 'Sulawesi', 20, []),
+    (73, 'SULAWESI SELATAN', 'Sulawesi', 13, []),
+    (74, 'SULAWESI TENGGARA', 'Sulawesi', 4, []),
+    (75, 'GORONTALO', 'Sulawesi', 3, []),
+    (76, 'SULAWESI BARAT', 'Sulawesi', 77, []),
+    (81, 'MALUKU', 'Maluku', 10, []),
+    (82, 'MALUKU UTARA', 'Maluku', 9, []),
+    (91, 'PAPUA BARAT', 'Papua', 23, []),
+    (94, 'PAPUA', 'Papua', 16, []),
+]
+
+# National aggregate row present in every BPS table; it has no region and no geometry
+NATIONAL_PROVINCE = (0, 'INDONESIA')
+
+# Provinces split off in 2022 that only some 2023 tables report; dropped until every source has them
+EXCLUDED_PROVINCES = ['PAPUA BARAT DAYA', 'PAPUA SELATAN', 'PAPUA TENGAH', 'PAPUA PEGUNUNGAN']
+
+@st.cache_resource
+def build_province_dimension():
+    """Build the province dimension table (integer province_id is the join key everywhere)"""
+    rows = [{
+        'province_id': 0, 'kode_bps': NATIONAL_PROVINCE[0], 'Provinsi': NATIONAL_PROVINCE[1],
+        'Region': None, 'geometry_id': None, 'aliases': []
+    }]
+    for province_id, (kode_bps, name, region, geometry_id, aliases) in enumerate(PROVINCES, start=1):
+        rows.append({
+            'province_id': province_id, 'kode_bps': kode_bps, 'Provinsi': name,
+            'Region': region, 'geometry_id': geometry_id, 'aliases': aliases
+        })
+    dim = pd.DataFrame(rows)
+    dim['province_id'] = dim['province_id'].astype('int16')
+    dim['kode_bps'] = dim['kode_bps'].astype('int16')
+    dim['geometry_id'] = dim['geometry_id'].astype('Int16')
+    dim['Provinsi'] = pd.Categorical(dim['Provinsi'])
+    dim['Region'] = pd.Categorical(dim['Region'])
+    return dim.set_index('province_id', drop=False)
+
+@st.cache_resource
+def province_alias_lookup():
+    """Map every known spelling (canonical name or alias) to its province_id"""
+    lookup = {}
+    for row in build_province_dimension().itertuples():
+        lookup[row.Provinsi] = row.province_id
+        for alias in row.aliases:
+            lookup[alias] = row.province_id
+    return lookup
+
+def province_ids_for_region(region):
+    """Integer keys of every province in a region"""
+    dim = build_province_dimension()
+    return dim.loc[dim['Region'] == region, 'province_id'].to_numpy()
+
+def province_id_for_name(name):
+    """Integer key for a canonical province name or alias, or None"""
+    return province_alias_lookup().get(str(name).upper().strip())
+
+def attach_province_keys(df, source=None):
+    """Replace the raw 'Provinsi' strings of a source table with the integer province_id key
     
-    .leaflet-control-zoom a:hover {
-        background-color: #3a3b42 !important;
-        color: white !important;
-    }
+    Names are resolved once per distinct spelling through the category codes, so the
+    cost does not grow with the number of rows.
+    """
+    names = df['Provinsi'].astype('category')
+    lookup = province_alias_lookup()
+    normalized = names.cat.categories.astype(str).str.upper().str.strip()
+    category_ids = normalized.map(lambda name: lookup.get(name, -1)).to_numpy(dtype='int16')
+    
+    unknown = [name for name, pid in zip(normalized, category_ids) if pid < 0 and name not in EXCLUDED_PROVINCES]
+    if unknown:
+        print(f"Unknown provinces in {source or 'dataset'}: {unknown}")
+    
+    codes = names.cat.codes.to_numpy()
+    province_ids = np.where(codes >= 0, category_ids[codes], -1)
+    df = df.drop(columns='Provinsi')
+    df.insert(0, 'province_id', province_ids.astype('int16'))
+    return df[df['province_id'] >= 0]
+
+def attach_province_labels(df, with_region=True):
+    """Add the canonical Provinsi (and Region) labels for a table keyed by province_id"""
+    dim = build_province_dimension()
+    ids = df['province_id'].to_numpy()
+    df = df.copy()
+    df.insert(1, 'Provinsi', dim['Provinsi'].reindex(ids).array)
+    if with_region:
+        df['Region'] = dim['Region'].reindex(ids).array
+    return df
+
+# --- Crime Rate Time Series Store ---
+
+CRIME_PERIOD_GLOB = "Risiko Penduduk Terkena Tindak Pidana*.csv"
+CRIME_PERIOD_PATTERN = re.compile(r"(\d{4})-(\d{4})\.csv$")
+CRIME_STORE_FILE = "crime_time_series.arrow"
+CRIME_STORE_MANIFEST = "crime_periods.json"
+REGENCY_CRIME_GLOB = "Jumlah Tindak Pidana Kabupaten_Kota Bulanan*.csv"
+REGENCY_STORE_FILE = "crime_regency_monthly.arrow"
+REGENCY_STORE_MANIFEST = "crime_regency_files.json"
+
+def discover_crime_period_files(dataset_dir=DATASET_DIR):
+    """Find every published crime-rate period file, keyed by file name"""
+    period_files = {}
+    for path in sorted(glob.glob(os.path.join(dataset_dir, CRIME_PERIOD_GLOB))):
+        if CRIME_PERIOD_PATTERN.search(os.path.basename(path)):
+            period_files[os.path.basename(path)] = path
+    return period_files
+
+def discover_regency_crime_files(dataset_dir=DATASET_DIR):
+    """Find every kabupaten/kota monthly crime count file, keyed by file name"""
+    return {os.path.basename(path): path for path in sorted(glob.glob(os.path.join(dataset_dir, REGENCY_CRIME_GLOB)))}
+
+def normalize_crime_period(df):
+    """Turn one wide period file (province x year columns) into long Provinsi/Tahun rows"""
+    # Older releases name the first column 'Kepolisian Daerah', newer ones 'Provinsi'
+    df = df.rename(columns={df.columns[0]: 'Provinsi'}).dropna(subset=['Provinsi'])
+    df = attach_province_keys(df, source='crime period')
+    
+    year_columns = [col for col in df.columns if str(col).strip().isdigit()]
+    df_long = df.melt(id_vars='province_id', value_vars=year_columns, var_name='Tahun', value_name='Tindak Pidana')
+    df_long['Tahun'] = df_long['Tahun'].astype('Int16')
+    return df_long
+
+def read_crime_period(path):
+    """Read and normalize one province-level crime-rate period file"""
+    return normalize_crime_period(read_dataset('tindak_pidana', path=path))
+
+def read_regency_crime_counts(path):
+    """Reduce one kabupaten/kota monthly file to province x month totals while it is read"""
+    df = aggregate_csv(
+        'tindak_pidana_kabupaten_bulanan', path,
+        keys=['Provinsi', 'Tahun', 'Bulan'], values=['Jumlah Tindak Pidana', 'Jumlah Penduduk'],
+    )
+    return attach_province_keys(df, source=os.path.basename(path))
+
+def regency_crime_rates(df_monthly):
+    """Crime rate per 100,000 people per province and year from aggregated regency counts"""
+    # Files may split a year by region or by month, so totals are summed across files first
+    df_monthly = df_monthly.groupby(['province_id', 'Tahun', 'Bulan'], as_index=False)[
+        ['Jumlah Tindak Pidana', 'Jumlah Penduduk']].sum()
+    df_yearly = df_monthly.groupby(['province_id', 'Tahun']).agg(
+        crimes=('Jumlah Tindak Pidana', 'sum'), population=('Jumlah Penduduk', 'mean'))
+    rates = (df_yearly['crimes'] / df_yearly['population'] * 100_000).astype('float32')
+    df_rates = rates.rename('Tindak Pidana').reset_index()
+    df_rates['Tahun'] = df_rates['Tahun'].astype('Int16')
+    return df_rates
+
+def update_file_store(source_files, read_file, store_file, manifest_file, snapshot_dir=SNAPSHOT_DIR, key=None):
+    """Keep an Arrow store of the rows read from a set of files, re-reading only new or changed files
     
-    /* Force any div containing folium maps to use dark theme */
-    div[data-testid="stFolium"] {
-        background-color: #25262d !important;
-        border-radius: 0.75rem !important;
-        overflow: hidden !important;
-        border: none !important;
-    }
+    Every row is tagged with the file it came from, so a changed or removed file only
+    replaces its own rows. With key, rows are unique on those columns: when files overlap (a
+    revised file republishing earlier years), the file later in source_files order wins.
+    """
+    store_path = os.path.join(snapshot_dir, store_file)
+    manifest_path = os.path.join(snapshot_dir, manifest_file)
     
-    /* Additional protection against black backgrounds */
-    .leaflet-container::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        bottom: 0;
-        background-color: #25262d;
-        z-index: -1;
-    }
-</style>
-""", unsafe_allow_html=True)
+    # Manifest maps each ingested file name to its content hash
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError("store layout changed")
+        ingested = manifest["files"]
+        df_store = feather.read_table(store_path, memory_map=True).to_pandas()
+    except (OSError, ValueError, KeyError):
+        ingested = {}
+        df_store = None
+    
+    removed = [name for name in ingested if name not in source_files]
+    hashes = {name: update_file_hash(hashlib.sha256(), path).hexdigest() for name, path in source_files.items()}
+    changed = {name: (path, hashes[name]) for name, path in source_files.items() if ingested.get(name) != hashes[name]}
+    if key and (removed or any(name in ingested for name in changed)):
+        # Rows a removed or rewritten file shadowed were dropped, so every file is read again
+        changed = {name: (path, hashes[name]) for name, path in source_files.items()}
+    
+    if df_store is not None and not changed and not removed:
+        return df_store
+    
+    # Only the new or changed files are read; rows from unchanged files are kept as they are
+    parts = [df_store[~df_store['source_file'].isin(removed + list(changed))]] if df_store is not None else []
+    if changed:
+        parsed = read_sources_concurrently({name: partial(read_file, path) for name, (path, _) in changed.items()})
+        for name, (_, file_hash) in changed.items():
+            parts.append(parsed[name].assign(source_file=name))
+            ingested[name] = file_hash
+    for name in removed:
+        del ingested[name]
+    
+    df_store = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=['source_file'])
+    if key and len(df_store):
+        file_order = df_store['source_file'].map({name: i for i, name in enumerate(source_files)})
+        df_store = (
+            df_store.iloc[file_order.argsort(kind='stable')]
+            .drop_duplicates(subset=key, keep='last')
+            .reset_index(drop=True)
+        )
+    df_store['source_file'] = df_store['source_file'].astype('category')
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        write_arrow_table(df_store, store_path)
+        write_json_atomic({"version": SNAPSHOT_VERSION, "files": ingested}, manifest_path)
+    except OSError as e:
+        print(f"Could not write {store_file}: {e}")
+    return df_store
 
-@st.cache_data
-def load_and_process_data():
-    """Load and preprocess all datasets"""
+def update_crime_time_series_store(dataset_dir=DATASET_DIR, snapshot_dir=SNAPSHOT_DIR):
+    """Append new or changed crime files to the long province_id x Tahun crime rate series"""
+    df_store = update_file_store(
+        discover_crime_period_files(dataset_dir), read_crime_period, CRIME_STORE_FILE, CRIME_STORE_MANIFEST, snapshot_dir,
+        key=['province_id', 'Tahun'],
+    ).drop(columns='source_file')
+    
+    regency_files = discover_regency_crime_files(dataset_dir)
+    if regency_files:
+        df_regency = update_file_store(
+            regency_files, read_regency_crime_counts, REGENCY_STORE_FILE, REGENCY_STORE_MANIFEST, snapshot_dir
+        )
+        df_regency = regency_crime_rates(df_regency)
+        # Published province-level rates take precedence for years both sources cover
+        df_regency = df_regency[~df_regency['Tahun'].isin(df_store['Tahun'].unique())]
+        df_store = pd.concat([df_store, df_regency], ignore_index=True)
+    return df_store.drop_duplicates(subset=['province_id', 'Tahun'], keep='last')
+
+# --- Dataset Registry ---
+
+def build_income_dataset():
+    """Average monthly net wage per province, February and August"""
+    return attach_province_keys(read_dataset('upah_gaji'), source='wages')
+
+def build_education_dataset():
+    """2023 completion rate per level plus the highest-level-completed shares derived from it"""
+    df = attach_province_keys(read_dataset('penyelesaian_pendidikan'), source='education')
+    df = df[['province_id', 'SD_2023', 'SMP_2023', 'SMA_2023']].copy()
+    df["Tidak Tamat SD"] = 100 - df["SD_2023"]
+    df["Pendidikan Terakhir SD"] = df["SD_2023"] - df["SMP_2023"]
+    df["Pendidikan Terakhir SMP"] = df["SMP_2023"] - df["SMA_2023"]
+    df["Pendidikan Terakhir SMA/PT"] = df["SMA_2023"]
+    # Differences of two-decimal percentages, kept at the published precision
+    derived = ["Tidak Tamat SD", "Pendidikan Terakhir SD", "Pendidikan Terakhir SMP"]
+    df[derived] = df[derived].round(2)
+    return df
+
+def build_crime_dataset():
+    """Crime rates 2021-2023 as wide Tindak Pidana columns for the 2023 cross-section"""
+    df_time_series = update_crime_time_series_store()
+    df = (
+        df_time_series[df_time_series['Tahun'].isin([2021, 2022, 2023])]
+        .pivot(index='province_id', columns='Tahun', values='Tindak Pidana')
+    )
+    df.columns = [f"Tindak Pidana {year}" for year in df.columns]
+    return df.reset_index()
+
+def build_gini_dataset():
+    """2023 Gini ratio per province"""
+    return attach_province_keys(read_dataset('gini_ratio'), source='gini ratio')
+
+def build_population_dataset():
+    """Population (thousands) per province"""
+    return attach_province_keys(read_dataset('penduduk'), source='population')
+
+# Province-level datasets, one row per province_id. Each is built on first use and snapshotted
+# on its own, so a panel only pays for the sources it actually joins.
+PROVINCE_DATASETS = {
+    'income': build_income_dataset,
+    'education': build_education_dataset,
+    'crime': build_crime_dataset,
+    'gini': build_gini_dataset,
+    'population': build_population_dataset,
+}
+
+# Column order of a joined province frame
+PROVINCE_COLUMNS = [
+    "province_id", "Provinsi", "Pendapatan Februari", "Pendapatan Agustus", "SD_2023", "SMP_2023", "SMA_2023",
+    "Tindak Pidana 2021", "Tindak Pidana 2022", "Tindak Pidana 2023", "gini_ratio_2023", "Jumlah Penduduk",
+    "Tidak Tamat SD", "Pendidikan Terakhir SD", "Pendidikan Terakhir SMP", "Pendidikan Terakhir SMA/PT", "Region",
+]
+
+@st.cache_data(max_entries=16)
+def load_province_dataset(name, data_version=None):
+    """Build one province-level dataset, or memory-map it from the snapshot when sources are unchanged
+    
+    data_version keys both the cache and the snapshot, so a new source release is rebuilt once.
+    """
+    source_hash = data_version or compute_data_version()
+    df = read_snapshot_table(name, source_hash)
+    if df is not None:
+        return df
     
-    # Load datasets from local CSV files
     try:
-        df_gini_ratio = pd.read_csv("dataset/Gini Ratio Menurut Provinsi dan Daerah 2023.csv")
-        df_pendapatan_bersih = pd.read_csv("dataset/Rata-rata Pendapatan Bersih Pekerja Bebas Menurut Provinsi dan Kelompok Umur, 2023.csv")
-        df_penyelesaian_pendidikan = pd.read_csv("dataset/Tingkat Penyelesaian Pendidikan Menurut Jenjang Pendidikan dan Provinsi, 2021-2023.csv")
-        df_jumlah_penduduk = pd.read_csv("dataset/Penduduk.csv")
-        
-        # Load crime data
-        df_tindak_pidana_2021_2023 = pd.read_csv("dataset/Risiko Penduduk Terkena Tindak Pidana (Per 100.000 Penduduk) , 2021-2023.csv")
-        df_tindak_pidana_2018_2020 = pd.read_csv("dataset/Risiko Penduduk Terkena Tindak Pidana (Per 100.000 Penduduk) , 2018-2020.csv")
-        df_tindak_pidana_2015_2017 = pd.read_csv("dataset/Risiko Penduduk Terkena Tindak Pidana (Per 100.000 Penduduk) , 2015-2017.csv")
-        df_tindak_pidana_2012_2014 = pd.read_csv("dataset/Risiko Penduduk Terkena Tindak Pidana (Per 100.000 Penduduk) , 2012-2014.csv")
-        
-        # Load OC Index data for global crime rankings
-        df_oc_index_2023 = pd.read_csv("dataset/oc_index_2023.csv", sep=';')
-        df_oc_index_2021 = pd.read_csv("dataset/oc_index_2021.csv", sep=';')
-        
+        df = PROVINCE_DATASETS[name]()
     except FileNotFoundError as e:
         st.error(f"File not found: {e}")
         st.stop()
+    require_data_version(data_version)
+    try:
+        write_snapshot_table(name, df, source_hash)
+    except OSError as e:
+        # Read-only deployments still work, they just rebuild the dataset on cold start
+        print(f"Could not write {name} snapshot: {e}")
+    return df
+
+@st.cache_data(max_entries=16)
+def load_province_frame(datasets, data_version=None):
+    """Join province-level datasets on province_id, with Provinsi and Region labels
     
-    # Standardization function
-    def standardize_number(value):
-        value = str(value)
-        if ',' in value and '.' in value:
-            if value.index(',') < value.index('.'):
-                value = value.replace(',', '')
-            else:
-                value = value.replace('.', '').replace(',', '.')
-        elif ',' in value:
-            value = value.replace(',', '.')
-        
-        try:
-            return float(value)
-        except ValueError:
-            return None
+    Every province in the dimension (national row included) gets a row, in BPS code order.
+    """
+    # Runs once per dataset combination and data version, so the per-dataset timings are logged
+    tables = read_sources_concurrently({
+        name: partial(load_province_dataset, name, data_version) for name in datasets
+    }, script_ctx=get_script_run_ctx())
+    
+    df = pd.DataFrame({'province_id': build_province_dimension().index})
+    for name in datasets:
+        df = df.merge(tables[name], on='province_id', how='left')
+    df = attach_province_labels(df)
+    return df[[col for col in PROVINCE_COLUMNS if col in df.columns]]
+
+@st.cache_data(max_entries=2)
+def load_crime_time_series(data_version=None):
+    """Long province_id x Tahun crime rate series with province labels"""
+    df = update_crime_time_series_store()
+    require_data_version(data_version)
+    return attach_province_labels(df, with_region=False)
+
+def filter_provinces(df, selected_region='Semua', selected_province='Semua'):
+    """Drop the national row and apply the sidebar region and province filters"""
+    df = df[df['province_id'] != NATIONAL_PROVINCE[0]]
+    if selected_region != 'Semua':
+        df = df[df['Region'] == selected_region]
+    if selected_province != 'Semua':
+        df = df[df['Provinsi'] == selected_province]
+    return df
+
+# --- Rank Tables ---
+
+# Metrics where a higher value is better rank descending (#1 = highest); all others rank ascending
+HIGHER_IS_BETTER_METRICS = {
+    'SD_2023', 'SMP_2023', 'SMA_2023', 'Pendidikan Terakhir SMA/PT', 'Pendapatan Februari', 'Pendapatan Agustus',
+}
+
+def build_rank_tables(df_asli):
+    """Rank every province and region on every numeric metric, excluding the national row
     
-    # Preprocess crime data - handle different column names
-    # Standardize all crime data to use 'Provinsi' column
-    crime_datasets = [
-        df_tindak_pidana_2012_2014,
-        df_tindak_pidana_2015_2017,
-        df_tindak_pidana_2018_2020,
-        df_tindak_pidana_2021_2023
-    ]
-    
-    for df in crime_datasets:
-        if 'Kepolisian Daerah' in df.columns:
-            df.rename(columns={'Kepolisian Daerah': 'Provinsi'}, inplace=True)
-        elif df.columns[0] != 'Provinsi' and 'Provinsi' not in df.columns:
-            # Use first column as Provinsi if it's not already named correctly
-            df.rename(columns={df.columns[0]: 'Provinsi'}, inplace=True)
-    
-    # Clean province names in all crime datasets
-    for df in crime_datasets:
-        if 'Provinsi' in df.columns:
-            df['Provinsi'] = df['Provinsi'].str.replace("METRO JAYA", "DKI JAKARTA", regex=False)
-            df['Provinsi'] = df['Provinsi'].str.replace("KEP.", "KEPULAUAN", regex=False)
-    
-    # Merge crime data
-    df_tindak_pidana_time_series = df_tindak_pidana_2012_2014.merge(df_tindak_pidana_2015_2017, on='Provinsi', how='outer')
-    df_tindak_pidana_time_series = df_tindak_pidana_time_series.merge(df_tindak_pidana_2018_2020, on='Provinsi', how='outer')
-    df_tindak_pidana_time_series = df_tindak_pidana_time_series.merge(df_tindak_pidana_2021_2023, on='Provinsi', how='outer')
-    
-    # Preprocess education data
-    provinces_to_drop = ['PAPUA BARAT DAYA', 'PAPUA SELATAN', 'PAPUA TENGAH', 'PAPUA PEGUNUNGAN']
-    df_penyelesaian_pendidikan = df_penyelesaian_pendidikan[~df_penyelesaian_pendidikan['Provinsi'].isin(provinces_to_drop)]
-    df_penyelesaian_pendidikan = df_penyelesaian_pendidikan.replace(re.escape("KEP."), "KEPULAUAN", regex=True)
-    
-    # Preprocess income data
-    if 'Unnamed: 1' in df_pendapatan_bersih.columns:
-        df_pendapatan_bersih = df_pendapatan_bersih.drop(columns='Unnamed: 1')
-    df_pendapatan_bersih['Provinsi'] = df_pendapatan_bersih['Provinsi'].str.upper().str.strip()
-    
-    # Preprocess Gini ratio data
-    df_gini_ratio = df_gini_ratio.replace(re.escape("KEP."), "KEPULAUAN", regex=True)
-    df_gini_ratio = df_gini_ratio.rename(columns={'2023': 'gini_ratio_2023'})
-    
-    # Preprocess population data
-    df_jumlah_penduduk["Provinsi"] = df_jumlah_penduduk["Provinsi"].str.upper().str.strip()
-    
-    # Merge all 2023 data
-    df_2023 = df_pendapatan_bersih.merge(df_penyelesaian_pendidikan, on='Provinsi', how='outer')
-    df_2023 = df_2023.merge(df_tindak_pidana_2021_2023, on='Provinsi', how='outer')
-    df_2023 = df_2023.merge(df_gini_ratio, on='Provinsi', how='outer')
-    df_2023 = df_2023.merge(df_jumlah_penduduk, on='Provinsi', how='outer')
-    
-    df_2023 = df_2023.dropna(subset=['Provinsi'])
-    
-    # Clean and convert data types
-    if 'Rata-rata Feb 2023' in df_2023.columns:
-        df_2023['Rata-rata Feb 2023'] = df_2023['Rata-rata Feb 2023'].astype(str).str.replace(' ', '', regex=False)
-        df_2023['Rata-rata Feb 2023'] = pd.to_numeric(df_2023['Rata-rata Feb 2023'], errors='coerce')
-    
-    df_2023 = df_2023.apply(pd.to_numeric, errors="ignore")
-    
-    # Rename columns for clarity
-    rename_dict = {
-        "2021": "Tindak Pidana 2021", 
-        "2022": "Tindak Pidana 2022", 
-        "2023": "Tindak Pidana 2023"
-    }
+    Returns {'provinces': ..., 'regions': ...}. Province ranks are indexed by (metric, province_id)
+    with national and within-region rank/total; region ranks by (metric, Region) with the region
+    mean and its rank among regions. Tied values share the better rank.
+    """
+    metrics = [col for col in df_asli.select_dtypes('number').columns if col != 'province_id']
+    df_long = (
+        df_asli[df_asli['province_id'] != NATIONAL_PROVINCE[0]]
+        .melt(id_vars=['province_id', 'Region'], value_vars=metrics, var_name='metric')
+        .dropna(subset=['value'])
+    )
+    # Rank on a signed score so one ascending pass covers both metric directions
+    df_long['score'] = df_long['value'].where(~df_long['metric'].isin(HIGHER_IS_BETTER_METRICS), -df_long['value'])
+    
+    national = df_long.groupby('metric')['score']
+    regional = df_long.groupby(['metric', 'Region'], observed=True)['score']
+    df_provinces = df_long.assign(
+        national_rank=national.rank(method='min'), national_total=national.transform('count'),
+        region_rank=regional.rank(method='min'), region_total=regional.transform('count'),
+    )
+    df_provinces = df_provinces.astype({col: 'int16' for col in ['national_rank', 'national_total', 'region_rank', 'region_total']})
     
-    if 'Rata-rata Feb 2023' in df_2023.columns:
-        rename_dict["Rata-rata Feb 2023"] = "Pendapatan Februari"
-    if 'Rata-rata Aug 2023' in df_2023.columns:
-        rename_dict["Rata-rata Aug 2023"] = "Pendapatan Agustus"
-    if 'Jumlah Penduduk (Ribu)' in df_2023.columns:
-        rename_dict["Jumlah Penduduk (Ribu)"] = "Jumlah Penduduk"
-    
-    df_2023 = df_2023.rename(columns=rename_dict)
-    
-    # Select and organize final columns
-    final_columns = ["Provinsi"]
-    
-    # Add available columns
-    possible_columns = [
-        "Pendapatan Februari", "Pendapatan Agustus", "SD_2023", "SMP_2023", "SMA_2023",
-        "Tindak Pidana 2021", "Tindak Pidana 2022", "Tindak Pidana 2023", 
-        "gini_ratio_2023", "Jumlah Penduduk"
-    ]
-    
-    for col in possible_columns:
-        if col in df_2023.columns:
-            final_columns.append(col)
-    
-    df_asli = df_2023[final_columns].copy()
-    
-    # Create education categories if education data exists
-    if all(col in df_asli.columns for col in ["SD_2023", "SMP_2023", "SMA_2023"]):
-        df_asli["Tidak Tamat SD"] = 100 - df_asli["SD_2023"]
-        df_asli["Pendidikan Terakhir SD"] = df_asli["SD_2023"] - df_asli["SMP_2023"]
-        df_asli["Pendidikan Terakhir SMP"] = df_asli["SMP_2023"] - df_asli["SMA_2023"]
-        df_asli["Pendidikan Terakhir SMA/PT"] = df_asli["SMA_2023"]
-    
-    # Add region information
-    region_map = {
-        "ACEH": "Sumatra",
-        "SUMATERA UTARA": "Sumatra",
-        "SUMATERA BARAT": "Sumatra",
-        "RIAU": "Sumatra",
-        "KEPULAUAN RIAU": "Sumatra",
-        "JAMBI": "Sumatra",
-        "SUMATERA SELATAN": "Sumatra",
-        "BENGKULU": "Sumatra",
-        "LAMPUNG": "Sumatra",
-        "KEPULAUAN BANGKA BELITUNG": "Sumatra",
-        "DKI JAKARTA": "Jawa",
-        "JAWA BARAT": "Jawa",
-        "JAWA TENGAH": "Jawa",
-        "DI YOGYAKARTA": "Jawa",
-        "JAWA TIMUR": "Jawa",
-        "BANTEN": "Jawa",
-        "KALIMANTAN BARAT": "Kalimantan",
-        "KALIMANTAN TENGAH": "Kalimantan",
-        "KALIMANTAN SELATAN": "Kalimantan",
-        "KALIMANTAN TIMUR": "Kalimantan",
-        "KALIMANTAN UTARA": "Kalimantan",
-        "SULAWESI UTARA": "Sulawesi",
-        "SULAWESI TENGAH": "Sulawesi",
-        "SULAWESI SELATAN": "Sulawesi",
-        "SULAWESI TENGGARA": "Sulawesi",
-        "GORONTALO": "Sulawesi",
-        "SULAWESI BARAT": "Sulawesi",
-        "BALI": "Bali & Nusa Tenggara",
-        "NUSA TENGGARA BARAT": "Bali & Nusa Tenggara",
-        "NUSA TENGGARA TIMUR": "Bali & Nusa Tenggara",
-        "MALUKU": "Maluku",
-        "MALUKU UTARA": "Maluku",
-        "PAPUA": "Papua",
-        "PAPUA BARAT": "Papua",
-    }
+    df_regions = df_long.groupby(['metric', 'Region'], observed=True).agg(value=('value', 'mean'), score=('score', 'mean'))
+    by_metric = df_regions.groupby(level='metric')['score']
+    df_regions['rank'] = by_metric.rank(method='min').astype('int16')
+    df_regions['total'] = by_metric.transform('count').astype('int16')
     
-    df_asli["Region"] = df_asli["Provinsi"].map(region_map)
-    
-    return df_asli, df_tindak_pidana_time_series
-
-# Load data function
-# @st.cache_data
-# def load_data():
-#     df = pd.read_csv('data.csv')
-#     return df
-
-# Load geojson data function
-@st.cache_data
-def load_geojson():
-    """Load Indonesia provinces geojson data and filter to only Indonesian provinces (robust version)"""
-    with open('map/indonesia-prov.geojson', 'r') as f:
-        geojson_data = json.load(f)
-    # List of valid Indonesian provinces (matching your mapping)
-    indonesian_provinces = set([
-        'ACEH', 'SUMATERA UTARA', 'SUMATERA BARAT', 'RIAU', 'KEPULAUAN RIAU',
-        'JAMBI', 'SUMATERA SELATAN', 'BENGKULU', 'LAMPUNG', 'KEPULAUAN BANGKA BELITUNG',
-        'DKI JAKARTA', 'JAWA BARAT', 'JAWA TENGAH', 'DI YOGYAKARTA', 'JAWA TIMUR', 'BANTEN',
-        'BALI', 'NUSA TENGGARA BARAT', 'NUSA TENGGARA TIMUR',
-        'KALIMANTAN BARAT', 'KALIMANTAN TENGAH', 'KALIMANTAN SELATAN', 'KALIMANTAN TIMUR', 'KALIMANTAN UTARA',
-        'SULAWESI UTARA', 'SULAWESI TENGAH', 'SULAWESI SELATAN', 'SULAWESI TENGGARA', 'GORONTALO', 'SULAWESI BARAT',
-        'MALUKU', 'MALUKU UTARA', 'PAPUA', 'PAPUA BARAT'
-    ])
-    filtered_features = []
-    for feature in geojson_data['features']:
-        props = feature.get('properties', {})
-        prov_name = props.get('Propinsi') or props.get('NAME_1') or props.get('name')
-        if prov_name in indonesian_provinces:
-            filtered_features.append(feature)
-    geojson_data['features'] = filtered_features
-    return geojson_data
-
-# Province name mapping function
-def create_province_mapping():
-    """Create mapping between geojson province names and CSV province names"""
-    geojson_to_csv = {
-        # Most provinces match exactly, but these need mapping
-        'KEPULAUAN BANGKA BELITUNG': 'KEP. BANGKA BELITUNG',
-        'KEPULAUAN RIAU': 'KEP. RIAU',
-        # All other provinces should match exactly
-        'DKI JAKARTA': 'DKI JAKARTA',
-        'JAWA BARAT': 'JAWA BARAT',
-        'JAWA TENGAH': 'JAWA TENGAH',
-        'DI YOGYAKARTA': 'DI YOGYAKARTA',
-        'JAWA TIMUR': 'JAWA TIMUR',
-        'BANTEN': 'BANTEN',
-        'BALI': 'BALI',
-        'NUSA TENGGARA BARAT': 'NUSA TENGGARA BARAT',
-        'NUSA TENGGARA TIMUR': 'NUSA TENGGARA TIMUR',
-        'KALIMANTAN BARAT': 'KALIMANTAN BARAT',
-        'KALIMANTAN TENGAH': 'KALIMANTAN TENGAH',
-        'KALIMANTAN SELATAN': 'KALIMANTAN SELATAN',
-        'KALIMANTAN TIMUR': 'KALIMANTAN TIMUR',
-        'KALIMANTAN UTARA': 'KALIMANTAN UTARA',
-        'SULAWESI UTARA': 'SULAWESI UTARA',
-        'SULAWESI TENGAH': 'SULAWESI TENGAH',
-        'SULAWESI SELATAN': 'SULAWESI SELATAN',
-        'SULAWESI TENGGARA': 'SULAWESI TENGGARA',
-        'GORONTALO': 'GORONTALO',
-        'SULAWESI BARAT': 'SULAWESI BARAT',
-        'MALUKU': 'MALUKU',
-        'MALUKU UTARA': 'MALUKU UTARA',
-        'PAPUA': 'PAPUA',
-        'PAPUA BARAT': 'PAPUA BARAT',
-        'SUMATERA UTARA': 'SUMATERA UTARA',
-        'SUMATERA BARAT': 'SUMATERA BARAT',
-        'RIAU': 'RIAU',
-        'JAMBI': 'JAMBI',
-        'SUMATERA SELATAN': 'SUMATERA SELATAN',
-        'BENGKULU': 'BENGKULU',
-        'LAMPUNG': 'LAMPUNG',
-        'ACEH': 'ACEH'
+    return {
+        'provinces': df_provinces.set_index(['metric', 'province_id']).drop(columns='score').sort_index(),
+        'regions': df_regions.drop(columns='score').sort_index(),
     }
-    return geojson_to_csv
 
-# Create a function to merge geojson data with CSV data
-@st.cache_data
-def merge_geojson_csv(geojson_data, csv_data):
-    """Merge geojson data with CSV data on province name"""
-    geojson_df = pd.json_normalize(geojson_data['features'])
-    geojson_df = geojson_df.rename(columns={"properties.Propinsi": "Provinsi"})
-    
-    # Create province name mapping
-    province_mapping = create_province_mapping()
-    geojson_df['Provinsi'] = geojson_df['Provinsi'].map(province_mapping)
-    
-    # Merge with CSV data
-    merged_df = geojson_df.merge(csv_data, on='Provinsi', how='left')
-    
-    return merged_df
+@st.cache_data(max_entries=2)
+def load_rank_tables(data_version=None):
+    """Rank tables for every metric of every province-level dataset (crime, Gini, education,
+    income, population), built once per data version"""
+    return build_rank_tables(load_province_frame(tuple(PROVINCE_DATASETS), data_version))
+
+# --- Aggregate Cube ---
+
+# Metric the cards and the top provinces chart show, the year it is compared with, and how many
+# provinces the chart lists
+CUBE_METRIC = 'Tindak Pidana 2023'
+CUBE_PREVIOUS_METRIC = 'Tindak Pidana 2022'
+TOP_N_PROVINCES = 10
+EMPTY_AGGREGATE = {
+    'count': 0, 'current': np.nan, 'previous': np.nan, 'region': None, 'ranks': None,
+    'top': pd.DataFrame(columns=['Provinsi', CUBE_METRIC]),
+}
+
+def build_aggregate_cube(df, rank_tables, states):
+    """Everything the metric cards and the top provinces chart show, for every filter state
+
+    Keyed by (region, province). Each entry holds the number of provinces, the current and
+    previous crime rate (the mean for national and regional states), the rank row for the
+    province or region, and the top provinces by crime rate.
+    """
+    df = df[df['province_id'] != NATIONAL_PROVINCE[0]]
+    if CUBE_METRIC not in df.columns or CUBE_PREVIOUS_METRIC not in df.columns:
+        return {}
+    ranked = df.dropna(subset=[CUBE_METRIC]).sort_values(CUBE_METRIC, ascending=False, kind='stable')
+    top = ranked[['Provinsi', 'Region', CUBE_METRIC]]
+    region_top = {region: rows.drop(columns='Region') for region, rows in top.groupby('Region', observed=True)}
+    region_means = df.groupby('Region', observed=True)[[CUBE_METRIC, CUBE_PREVIOUS_METRIC]].mean()
+    region_counts = df.groupby('Region', observed=True).size()
+    province_ranks = rank_tables['provinces'].xs(CUBE_METRIC, level='metric')
+    region_ranks = rank_tables['regions'].xs(CUBE_METRIC, level='metric')
+    provinces = df.set_index('Provinsi')
+
+    cube = {}
+    for region, province in states:
+        if province != 'Semua':
+            if province not in provinces.index:
+                continue
+            row = provinces.loc[province]
+            if region != 'Semua' and row['Region'] != region:
+                continue
+            cube[(region, province)] = {
+                'count': 1,
+                'current': row[CUBE_METRIC],
+                'previous': row[CUBE_PREVIOUS_METRIC],
+                'region': row['Region'],
+                'ranks': province_ranks.loc[row['province_id']] if row['province_id'] in province_ranks.index else None,
+                'top': top[top['Provinsi'] == province].drop(columns='Region'),
+            }
+        elif region != 'Semua':
+            if region not in region_counts.index:
+                continue
+            cube[(region, province)] = {
+                'count': int(region_counts[region]),
+                'current': region_means.loc[region, CUBE_METRIC],
+                'previous': region_means.loc[region, CUBE_PREVIOUS_METRIC],
+                'region': region,
+                'ranks': region_ranks.loc[region] if region in region_ranks.index else None,
+                'top': region_top.get(region, EMPTY_AGGREGATE['top']).head(TOP_N_PROVINCES),
+            }
+        else:
+            cube[(region, province)] = {
+                'count': len(df),
+                'current': df[CUBE_METRIC].mean(),
+                'previous': df[CUBE_PREVIOUS_METRIC].mean(),
+                'region': None,
+                'ranks': None,
+                'top': top.drop(columns='Region').head(TOP_N_PROVINCES),
+            }
+    return cube
+
+@st.cache_resource(max_entries=2)
+def load_aggregate_cube(data_version=None):
+    """Aggregate cube for every filter state, built once per data version and shared by every
+    session; treat it as read-only. Its ranks are the crime slice of the full rank tables."""
+    return build_aggregate_cube(
+        load_province_frame(panel_province_datasets('key_metrics'), data_version), load_rank_tables(data_version),
+        choropleth_filter_states()
+    )
+
+def aggregate_for(cube, region='Semua', province='Semua'):
+    """Cube entry for a filter state; a state without data gets an empty entry"""
+    return cube.get((region, province), EMPTY_AGGREGATE)
+
+# --- Province Geometry Store ---
+
+GEOMETRY_SOURCE = os.path.join("map", "indonesia-prov.geojson")
+# Province key, name and precomputed bounds stored next to the geometry
+GEOMETRY_COLUMNS = ['province_id', 'Provinsi', 'minx', 'miny', 'maxx', 'maxy']
+
+def convert_province_geometry(path=GEOMETRY_SOURCE):
+    """Build step: read the boundary GeoJSON and key it by the province dimension
+
+    Features without a province in the dimension are dropped; rows are ordered by province_id.
+    """
+    start = time.perf_counter()
+    features = gpd.read_file(path, columns=['ID'])
+    report_load_timings({os.path.basename(path): time.perf_counter() - start})
+    dim = build_province_dimension().dropna(subset=['geometry_id'])
+    frame = features.merge(
+        dim[['geometry_id', 'province_id', 'Provinsi']].astype({'geometry_id': 'int64'}),
+        left_on='ID', right_on='geometry_id',
+    )
+    frame = frame.sort_values('province_id', ignore_index=True)
+    frame[['minx', 'miny', 'maxx', 'maxy']] = frame.geometry.bounds
+    return frame[[*GEOMETRY_COLUMNS, 'geometry']].astype({'province_id': 'int16', 'Provinsi': 'string'})
+
+def write_geometry_store(frame, source_hash, snapshot_dir=SNAPSHOT_DIR):
+    """Write the province geometry as GeoParquet plus its manifest"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, "geometry.parquet")
+    write_file_atomic(path, partial(frame.to_parquet, index=False))
+    write_json_atomic({"source_hash": source_hash}, os.path.join(snapshot_dir, "geometry.json"))
+
+def read_geometry_store(source_hash, columns=None, province_ids=None, snapshot_dir=SNAPSHOT_DIR):
+    """Read province geometry from the GeoParquet store if it was built from the same sources, else None
+
+    columns and province_ids are pushed down to the Parquet reader, so only those are decoded.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, "geometry.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("source_hash") != source_hash:
+            return None
+        filters = [('province_id', 'in', list(province_ids))] if province_ids is not None else None
+        return gpd.read_parquet(
+            os.path.join(snapshot_dir, "geometry.parquet"),
+            columns=[*columns, 'geometry'] if columns is not None else None,
+            filters=filters,
+        )
+    except (OSError, ValueError, KeyError):
+        return None
+
+def load_province_geometry(data_version=None, columns=('province_id',), province_ids=None):
+    """Province geometry as a GeoDataFrame, read from the GeoParquet store
+
+    The store is converted from the GeoJSON once per data version; read-only deployments fall
+    back to converting in memory.
+    """
+    source_hash = data_version or compute_data_version()
+    columns = list(columns) if columns is not None else None
+    frame = read_geometry_store(source_hash, columns, province_ids)
+    if frame is not None:
+        return frame
+
+    frame = convert_province_geometry()
+    require_data_version(data_version)
+    try:
+        write_geometry_store(frame, source_hash)
+    except OSError as e:
+        print(f"Could not write geometry store: {e}")
+    if province_ids is not None:
+        frame = frame[frame['province_id'].isin(province_ids)].reset_index(drop=True)
+    return frame[[*columns, 'geometry']] if columns is not None else frame
+
+# --- Simplified Geometry Levels ---
+
+# Per map view: simplification tolerance in degrees (roughly one screen pixel at the view's
+# zoom) and the TopoJSON quantization grid the simplified coordinates are snapped to
+GEOMETRY_LEVELS = {
+    'national': {'tolerance': 0.05, 'quantization': 10_000},   # zoom 4
+    'region': {'tolerance': 0.02, 'quantization': 30_000},     # zoom 6
+    'province': {'tolerance': 0.005, 'quantization': 100_000}, # zoom 7
+}
+# TopoJSON object holding the provinces, and the feature properties the maps use
+TOPOLOGY_OBJECT = 'provinces'
+TOPOLOGY_PROPERTIES = ['province_id']
+
+def simplify_province_geometries(geometries, tolerance):
+    """Simplify all provinces as one coverage so neighbouring provinces keep a common border
+
+    Each shared edge is simplified once, so no gaps open between provinces (shapely >= 2.1).
+    """
+    return shapely.coverage_simplify(geometries, tolerance)
+
+def quantize_ring(ring, origin, scale):
+    """Snap a ring onto the integer grid, dropping points that collapse onto their predecessor"""
+    grid = np.rint((shapely.get_coordinates(ring) - origin) / scale).astype(np.int64)
+    keep = np.r_[True, np.any(np.diff(grid, axis=0) != 0, axis=1)]
+    return [tuple(point) for point in grid[keep].tolist()]
+
+def cut_ring(ring, junctions):
+    """Split a closed ring into arcs at its junctions; a ring without any becomes one arc"""
+    points = ring[:-1]
+    cuts = [i for i, point in enumerate(points) if point in junctions]
+    # Start at the first junction, or at the smallest point so a ring shared whole dedupes
+    start = cuts[0] if cuts else points.index(min(points))
+    rotated = points[start:] + points[:start] + [points[start]]
+    offsets = [i - start for i in cuts] + [len(points)] if cuts else [0, len(points)]
+    return [rotated[begin:end + 1] for begin, end in zip(offsets, offsets[1:])]
+
+def encode_topology(geometries, properties, quantization, object_name=TOPOLOGY_OBJECT):
+    """Encode polygons as quantized TopoJSON: borders shared by two provinces are stored once
+    as an arc, with integer coordinates delta-encoded along each arc"""
+    min_x, min_y, max_x, max_y = shapely.total_bounds(geometries)
+    origin = np.array([min_x, min_y])
+    scale = np.array([(max_x - min_x) / (quantization - 1) or 1.0, (max_y - min_y) / (quantization - 1) or 1.0])
+
+    # Quantized rings per polygon; a polygon whose exterior collapses on the grid is dropped
+    shapes = []
+    for geometry in geometries:
+        polygons = []
+        for polygon in shapely.get_parts(geometry):
+            rings = [quantize_ring(polygon.exterior, origin, scale)]
+            rings += [quantize_ring(interior, origin, scale) for interior in polygon.interiors]
+            if len(rings[0]) >= 4:
+                polygons.append([ring for ring in rings if len(ring) >= 4])
+        shapes.append(polygons)
+
+    # A junction is a point whose rings continue to more than two different neighbours:
+    # where a shared border starts or ends, or where three provinces meet
+    neighbours = defaultdict(set)
+    for polygons in shapes:
+        for rings in polygons:
+            for ring in rings:
+                for prev_point, point, next_point in zip([ring[-2]] + ring[:-2], ring[:-1], ring[1:]):
+                    neighbours[point].update((prev_point, next_point))
+    junctions = {point for point, adjacent in neighbours.items() if len(adjacent) > 2}
+
+    arcs = []
+    arc_index = {}
+    def arc_ref(arc):
+        key = tuple(arc)
+        if key in arc_index:
+            return arc_index[key]
+        if key[::-1] in arc_index:
+            return ~arc_index[key[::-1]]
+        arc_index[key] = len(arcs)
+        arcs.append(arc)
+        return arc_index[key]
+
+    topology_geometries = []
+    for polygons, props in zip(shapes, properties):
+        polygon_arcs = [[[arc_ref(arc) for arc in cut_ring(ring, junctions)] for ring in rings] for rings in polygons]
+        if not polygon_arcs:
+            topology_geometry = {'type': None}
+        elif len(polygon_arcs) == 1:
+            topology_geometry = {'type': 'Polygon', 'arcs': polygon_arcs[0]}
+        else:
+            topology_geometry = {'type': 'MultiPolygon', 'arcs': polygon_arcs}
+        topology_geometry['properties'] = {key: props[key] for key in TOPOLOGY_PROPERTIES}
+        topology_geometries.append(topology_geometry)
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': scale.tolist(), 'translate': origin.tolist()},
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': topology_geometries}},
+        'arcs': [np.diff(np.asarray(arc), axis=0, prepend=[[0, 0]]).tolist() for arc in arcs],
+    }
+
+def geometry_level_for_view(region_filter=None, province_filter=None):
+    """Coarsest geometry level that still looks right at the zoom the map opens with"""
+    if province_filter and province_filter != 'Semua':
+        return 'province'
+    if region_filter and region_filter != 'Semua':
+        return 'region'
+    return 'national'
+
+# --- Map View Index ---
+
+# Opening view for a map of the whole country, one region or one province: zoom level and
+# the padding in degrees kept around the fitted area
+NATIONAL_VIEW = {'center': [-2.5, 118.0], 'zoom': 4, 'bounds': [[-11.0, 94.0], [6.0, 141.0]]}
+VIEW_ZOOM = {'region': 6, 'province': 7}
+VIEW_PADDING = {'region': 1.0, 'province': 0.5}
+
+def fit_view(bounds, kind):
+    """Center, zoom and padded bounds that fit a (min_lng, min_lat, max_lng, max_lat) box"""
+    min_lng, min_lat, max_lng, max_lat = (round(float(value), 4) for value in bounds)
+    padding = VIEW_PADDING[kind]
+    return {
+        'center': [(min_lat + max_lat) / 2, (min_lng + max_lng) / 2],
+        'zoom': VIEW_ZOOM[kind],
+        'bounds': [[min_lat - padding, min_lng - padding], [max_lat + padding, max_lng + padding]],
+    }
+
+def build_view_index(geometry):
+    """Precomputed opening view for every province and every region, so fitting a map is a lookup"""
+    province_bounds = dict(zip(
+        geometry['province_id'].tolist(), geometry[['minx', 'miny', 'maxx', 'maxy']].to_numpy()
+    ))
+    dim = build_province_dimension()
+    regions = {}
+    for region, ids in dim.groupby('Region', observed=True)['province_id']:
+        bounds = np.array([province_bounds[province_id] for province_id in ids if province_id in province_bounds])
+        if len(bounds):
+            regions[region] = fit_view([*bounds[:, :2].min(axis=0), *bounds[:, 2:].max(axis=0)], 'region')
+    return {
+        'national': NATIONAL_VIEW,
+        'provinces': {province_id: fit_view(bounds, 'province') for province_id, bounds in province_bounds.items()},
+        'regions': regions,
+    }
+
+def map_view(views, region_filter=None, province_filter=None):
+    """The opening view for the active filter; national when the filtered area has no geometry"""
+    if province_filter and province_filter != 'Semua':
+        return views['provinces'].get(province_id_for_name(province_filter), views['national'])
+    if region_filter and region_filter != 'Semua':
+        return views['regions'].get(region_filter, views['national'])
+    return views['national']
+
+# Map component frontend; the geometry levels are published next to it so its iframe can fetch them
+MAP_COMPONENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "map_component")
+MAP_GEOMETRY_DIR = os.path.join(MAP_COMPONENT_DIR, "geometry")
+
+# Leaflet, which the map component reads from vendor/ so it works fully offline; until the files
+# are vendored (--vendor-assets) it loads the same pinned release from the CDN, checked against
+# these hashes. Keep in sync with LIBRARIES in map_component/index.html.
+MAP_VENDOR_DIR = os.path.join(MAP_COMPONENT_DIR, "vendor")
+MAP_VENDOR_ASSETS = {
+    "leaflet.js": (
+        "https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js",
+        "5819285cec137b229c94e1ee5ad73e8b6b84345a4367d60f75fe477fe0fb7b03",
+    ),
+    "leaflet.css": (
+        "https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css",
+        "90b693d86392a4779c861b28cf307e7e59c3fb35328c4d8b95f58f814d38c722",
+    ),
+}
+
+def vendor_map_assets(vendor_dir=MAP_VENDOR_DIR):
+    """Download the map component's libraries that are not vendored yet, rejecting any file whose
+    sha256 differs from the pinned one. Returns the names that were fetched."""
+    fetched = []
+    for name, (url, sha256) in MAP_VENDOR_ASSETS.items():
+        path = os.path.join(vendor_dir, name)
+        if os.path.exists(path) and update_file_hash(hashlib.sha256(), path).hexdigest() == sha256:
+            continue
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        if hashlib.sha256(data).hexdigest() != sha256:
+            raise ValueError(f"{url} does not match its pinned sha256; not vendoring {name}")
+        os.makedirs(vendor_dir, exist_ok=True)
+        write_file_atomic(path, partial(write_binary_file, data))
+        fetched.append(name)
+    return fetched
+
+# Data versions whose published map files are kept: the live one and the one before it, which
+# reruns and fragments pinned to the previous version may still be fetching
+PUBLISHED_VERSIONS_KEPT = 2
+
+def superseded_versions(published, data_version, keep=PUBLISHED_VERSIONS_KEPT):
+    """Versions to remove from {version: publish time}: all but data_version and the most
+    recently published others, up to keep versions in total"""
+    others = sorted((version for version in published if version != data_version), key=published.get, reverse=True)
+    return others[keep - 1:]
+
+def publish_map_geometry(levels, data_version, geometry_dir=MAP_GEOMETRY_DIR):
+    """Write each serialized geometry level for the map component, named by data version, and
+    return their URLs relative to the component. Files of superseded versions are removed."""
+    os.makedirs(geometry_dir, exist_ok=True)
+    urls = {}
+    for level, topology_json in levels.items():
+        filename = f"{data_version}-{level}.json"
+        path = os.path.join(geometry_dir, filename)
+        if not os.path.exists(path):
+            # Written atomically so the browser never fetches a partial file
+            write_file_atomic(path, partial(write_text_file, topology_json))
+        urls[level] = f"geometry/{filename}"
+    published = defaultdict(float)
+    for path in glob.glob(os.path.join(geometry_dir, "*.json")):
+        version = os.path.basename(path).split("-", 1)[0]
+        published[version] = max(published[version], os.path.getmtime(path))
+    for version in superseded_versions(published, data_version):
+        for path in glob.glob(os.path.join(geometry_dir, f"{version}-*.json")):
+            os.remove(path)
+    return urls
+
+@st.cache_resource(max_entries=2)
+def load_map_geometry(data_version=None):
+    """Province geometry for the maps, built once per data version and shared by every session:
+    serialized quantized TopoJSON at every level in GEOMETRY_LEVELS (inline, and published as
+    files for the map component unless its directory is read-only), the vector tile URL when
+    VECTOR_TILES is on, the province ids it covers, and the opening view for every province and region. Treat it as read-only; per-metric values travel separately as a spec
+    (see choropleth_spec)."""
+    geometry = load_province_geometry(data_version, columns=['province_id', 'minx', 'miny', 'maxx', 'maxy'])
+    geometries = geometry.geometry.values
+    properties = geometry[TOPOLOGY_PROPERTIES].to_dict('records')
+    levels = {
+        level: json.dumps(
+            encode_topology(
+                simplify_province_geometries(geometries, spec['tolerance']), properties, spec['quantization']
+            ),
+            separators=(',', ':'),
+        )
+        for level, spec in GEOMETRY_LEVELS.items()
+    }
+    data_version = data_version or compute_data_version()
+    try:
+        urls = publish_map_geometry(levels, data_version)
+    except OSError as e:
+        # Read-only deployments send the geometry inline with each map instead
+        print(f"Could not publish map geometry: {e}")
+        urls = None
+    tiles_url = None
+    if VECTOR_TILES:
+        try:
+            tiles_url = build_vector_tiles(data_version)
+        except OSError as e:
+            # Without a writable tile directory the maps draw the TopoJSON levels
+            print(f"Could not write vector tiles: {e}")
+    return {
+        'version': data_version,
+        'levels': levels,
+        'urls': urls,
+        'tiles_url': tiles_url,
+        'province_ids': tuple(props['province_id'] for props in properties),
+        'views': build_view_index(geometry),
+    }
+
+# --- Vector Tiles ---
+
+# Optional: serve the map geometry as Mapbox Vector Tiles instead of one TopoJSON per map. Tiles
+# are cut once per data version into the component directory, so the Streamlit server itself
+# serves them and Leaflet only fetches the tiles in view. Meant for boundary sets too large to
+# send whole, such as kabupaten/kota; build ahead of deployment with --build-tiles.
+VECTOR_TILES = False
+VECTOR_TILE_DIR = os.path.join(MAP_COMPONENT_DIR, "tiles")
+VECTOR_TILE_ZOOMS = range(4, 11)  # the zoom range the maps allow
+VECTOR_TILE_EXTENT = 4096
+VECTOR_TILE_BUFFER = 64  # tile units drawn past each edge so borders meet cleanly at tile seams
+
+def tile_geometry_level(zoom):
+    """The GEOMETRY_LEVELS entry detailed enough for a tile zoom"""
+    if zoom <= 5:
+        return 'national'
+    if zoom == 6:
+        return 'region'
+    return 'province'
+
+def project_to_tile_space(geometries, zoom, extent=VECTOR_TILE_EXTENT):
+    """Web Mercator in tile units at a zoom: tile (x, y) covers [x, x + 1) * extent on each axis"""
+    world = extent * 2 ** zoom
+    def project(coords):
+        lat = np.radians(np.clip(coords[:, 1], -85.0511, 85.0511))
+        x = (coords[:, 0] + 180.0) / 360.0 * world
+        y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * world
+        return np.column_stack([x, y])
+    return shapely.transform(geometries, project)
+
+def pb_varint(value):
+    """Protobuf base-128 varint"""
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def pb_field(number, wire_type, payload):
+    """One protobuf field: a varint (wire type 0) or length-delimited bytes (wire type 2)"""
+    key = pb_varint(number << 3 | wire_type)
+    if wire_type == 0:
+        return key + pb_varint(payload)
+    return key + pb_varint(len(payload)) + payload
+
+def pb_packed(number, values):
+    """Packed repeated varint field"""
+    return pb_field(number, 2, b"".join(pb_varint(value) for value in values))
+
+def encode_polygon_commands(polygons):
+    """MVT geometry commands (MoveTo, LineTo, ClosePath with zigzag deltas) for polygons in tile units"""
+    commands = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for polygon in polygons:
+        # MVT wants exterior rings with positive area in tile coordinates, holes negative
+        polygon = shapely.geometry.polygon.orient(polygon, sign=1.0)
+        for ring_number, ring in enumerate([polygon.exterior, *polygon.interiors]):
+            points = np.rint(shapely.get_coordinates(ring)[:-1]).astype(np.int64)
+            points = points[np.r_[True, np.any(np.diff(points, axis=0) != 0, axis=1)]]
+            if len(points) > 1 and (points[-1] == points[0]).all():
+                points = points[:-1]
+            if len(points) < 3:
+                if ring_number == 0:
+                    break  # exterior collapsed below a tile unit: drop the polygon with its holes
+                continue
+            deltas = np.diff(points, axis=0, prepend=cursor[np.newaxis])
+            zigzag = ((deltas << 1) ^ (deltas >> 63)).tolist()
+            commands += [1 | 1 << 3, *zigzag[0], 2 | (len(points) - 1) << 3]
+            commands += [value for point in zigzag[1:] for value in point]
+            commands.append(7 | 1 << 3)
+            cursor = points[-1]
+    return commands
+
+def encode_vector_tile(features, layer_name=TOPOLOGY_OBJECT, extent=VECTOR_TILE_EXTENT):
+    """A one-layer Mapbox Vector Tile from (province_id, polygons) pairs; the province id is both
+    the feature id and its province_id property"""
+    layer = pb_field(15, 0, 2) + pb_field(1, 2, layer_name.encode("utf-8"))
+    values = []
+    for province_id, polygons in features:
+        commands = encode_polygon_commands(polygons)
+        if not commands:
+            continue
+        values.append(province_id)
+        feature = pb_field(1, 0, province_id) + pb_packed(2, [0, len(values) - 1])
+        feature += pb_field(3, 0, 3) + pb_packed(4, commands)  # type 3 = POLYGON
+        layer += pb_field(2, 2, feature)
+    layer += pb_field(3, 2, b"province_id")
+    layer += b"".join(pb_field(4, 2, pb_field(5, 0, value)) for value in values)  # uint_value
+    layer += pb_field(5, 0, extent)
+    return pb_field(3, 2, layer) if values else None
+
+def cut_vector_tiles(geometries, province_ids, zoom, extent=VECTOR_TILE_EXTENT, buffer=VECTOR_TILE_BUFFER):
+    """Encoded tiles of one zoom as {(x, y): bytes}; tiles no province touches are left out"""
+    tiles = defaultdict(list)
+    for province_id, geometry in zip(province_ids, project_to_tile_space(geometries, zoom, extent)):
+        min_x, min_y, max_x, max_y = geometry.bounds
+        for x in range(int((min_x - buffer) // extent), int((max_x + buffer) // extent) + 1):
+            for y in range(int((min_y - buffer) // extent), int((max_y + buffer) // extent) + 1):
+                clipped = shapely.clip_by_rect(
+                    geometry, x * extent - buffer, y * extent - buffer,
+                    (x + 1) * extent + buffer, (y + 1) * extent + buffer
+                )
+                polygons = [
+                    part for part in shapely.get_parts(shapely.transform(clipped, lambda c: c - [x * extent, y * extent]))
+                    if part.geom_type == 'Polygon'
+                ]
+                if polygons:
+                    tiles[(x, y)].append((province_id, polygons))
+    encoded = {key: encode_vector_tile(features) for key, features in tiles.items()}
+    return {key: data for key, data in encoded.items() if data is not None}
+
+def build_vector_tiles(data_version=None, tile_dir=VECTOR_TILE_DIR):
+    """Cut and write every province tile of a data version, once: a finished build leaves a
+    manifest and is reused. Tiles of superseded versions are removed. Returns the tile URL
+    template relative to the map component."""
+    data_version = data_version or compute_data_version()
+    version_dir = os.path.join(tile_dir, data_version)
+    manifest_path = os.path.join(version_dir, "tiles.json")
+    if not os.path.exists(manifest_path):
+        geometry = load_province_geometry(data_version)
+        geometries = geometry.geometry.values
+        province_ids = geometry['province_id'].tolist()
+        simplified = {
+            level: simplify_province_geometries(geometries, spec['tolerance'])
+            for level, spec in GEOMETRY_LEVELS.items()
+        }
+        counts = {}
+        for zoom in VECTOR_TILE_ZOOMS:
+            tiles = cut_vector_tiles(simplified[tile_geometry_level(zoom)], province_ids, zoom)
+            for (x, y), data in tiles.items():
+                path = os.path.join(version_dir, str(zoom), str(x), f"{y}.pbf")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+            counts[zoom] = len(tiles)
+        # Manifest is written last, so it only ever marks a complete set of tiles
+        write_json_atomic({"tiles": counts}, manifest_path)
+    # A version is published when its manifest is written; unfinished builds count as oldest
+    published = {
+        os.path.basename(path): os.path.getmtime(os.path.join(path, "tiles.json"))
+        if os.path.exists(os.path.join(path, "tiles.json")) else 0.0
+        for path in glob.glob(os.path.join(tile_dir, "*"))
+    }
+    for version in superseded_versions(published, data_version):
+        shutil.rmtree(os.path.join(tile_dir, version), ignore_errors=True)
+    return f"tiles/{data_version}/{{z}}/{{x}}/{{y}}.pbf"
 
 def create_bubble_chart(df, x_col, y_col, size_col, color_col=None, title="Bubble Chart", region_filter=None, province_filter=None):
     """Create an interactive bubble chart using Plotly with dynamic coloring based on region/province filter"""
@@ -489,7 +1466,7 @@ def create_bubble_chart(df, x_col, y_col, size_col, color_col=None, title="Bubbl
 def create_correlation_heatmap(df):
     """Create correlation heatmap for numeric columns"""
     numeric_cols = df.select_dtypes(include=[np.number]).columns
-    numeric_cols = [col for col in numeric_cols if col != 'Provinsi']
+    numeric_cols = [col for col in numeric_cols if col not in ['Provinsi', 'province_id']]
     
     if len(numeric_cols) > 1:
         corr_matrix = df[numeric_cols].corr()
@@ -506,834 +1483,412 @@ def create_correlation_heatmap(df):
             height=600,
             plot_bgcolor='#25262d',
             paper_bgcolor='#25262d',
-            font_color='white',
-            margin=dict(l=20, r=20, t=40, b=20)
-        )
-        return fig
-    return None
-
-def create_trend_chart(df_time_series):
-    """Create trend chart for crime data over time"""
-    if df_time_series is not None and not df_time_series.empty:
-        # Get Indonesia data
-        indonesia_data = df_time_series[df_time_series['Provinsi'] == 'INDONESIA']
-        
-        if not indonesia_data.empty:
-            years = [str(year) for year in range(2012, 2024)]
-            available_years = [year for year in years if year in indonesia_data.columns]
-            
-            if available_years:
-                trend_data = []
-                for year in available_years:
-                    value = indonesia_data[year].iloc[0]
-                    if pd.notna(value):
-                        trend_data.append({'Year': int(year), 'Crime_Rate': float(value)})
-                
-                if trend_data:
-                    trend_df = pd.DataFrame(trend_data)
-                    
-                    fig = px.line(
-                        trend_df, 
-                        x='Year', 
-                        y='Crime_Rate',
-                        title="Tren Tingkat Kriminalitas Indonesia (2012-2023)",
-                        markers=True
-                    )
-                    
-                    fig.update_layout(
-                        height=400,
-                        xaxis_title="Tahun",
-                        yaxis_title="Tingkat Kriminalitas (per 100.000 penduduk)",
-                        plot_bgcolor='#25262d',
-                        paper_bgcolor='#25262d',
-                        font_color='white',
-                        margin=dict(l=20, r=20, t=40, b=20)
-                    )
-                    
-                    return fig
-    
-    return None
-
-def create_regional_comparison(df):
-    """Create regional comparison charts"""
-    if 'Region' in df.columns:
-        # Group by region and calculate means
-        regional_stats = df.groupby('Region').agg({
-            col: 'mean' for col in df.select_dtypes(include=[np.number]).columns
-            if col not in ['Provinsi']
-        }).round(2)
-        
-        return regional_stats
-    return None
-
-def create_choropleth_map(df, metric, geojson_data, province_mapping, region_filter=None, province_filter=None):
-    """Create a choropleth map using folium, with dynamic zoom to provinces/regions when filtered"""
-    # Prepare data based on selected metric
-    if metric == 'Crime Rate 2023':
-        map_data = df[['Provinsi', 'Tindak Pidana 2023', 'Region']].dropna(subset=['Provinsi'])
-        metric_col = 'Tindak Pidana 2023'
-        title = 'Tindak Pidana per 100,000 Penduduk (2023)'
-    elif metric == 'Population':
-        map_data = df[['Provinsi', 'Jumlah Penduduk', 'Region']].dropna(subset=['Provinsi'])
-        metric_col = 'Jumlah Penduduk'
-        title = 'Populasi berdasarkan Provinsi (ribu jiwa, 2023)'
-    elif metric == 'Gini Ratio':
-        map_data = df[['Provinsi', 'gini_ratio_2023', 'Region']].dropna(subset=['Provinsi'])
-        metric_col = 'gini_ratio_2023'
-        title = 'Gini Ratio berdasarkan Provinsi (2023)'
-    elif metric == 'Income':
-        map_data = df[['Provinsi', 'Pendapatan Agustus', 'Region']].dropna(subset=['Provinsi'])
-        metric_col = 'Pendapatan Agustus'
-        title = 'Average Income by Province (August 2023)'
-    elif metric == 'Education':
-        map_data = df[['Provinsi', 'Pendidikan Terakhir SMA/PT', 'Region']].dropna(subset=['Provinsi'])
-        metric_col = 'Pendidikan Terakhir SMA/PT'
-        title = 'Tingkat Penyelesaian Pendidikan SMA berdasarkan Provinsi (2023)'
-    else:
-        map_data = df[['Provinsi', 'Tindak Pidana 2023', 'Region']].dropna(subset=['Provinsi'])
-        metric_col = 'Tindak Pidana 2023'
-        title = 'Tindak Pidana per 100,000 Penduduk (2023)'
-
-    reverse_mapping = {v: k for k, v in province_mapping.items()}
-
-    # Calculate map bounds and zoom based on filter
-    def get_bounds_for_features(features):
-        """Calculate bounds for a list of GeoJSON features"""
-        if not features:
-            return None
-        
-        all_coords = []
-        for feature in features:
-            geom = feature['geometry']
-            if geom['type'] == 'Polygon':
-                coords = geom['coordinates'][0]
-                all_coords.extend(coords)
-            elif geom['type'] == 'MultiPolygon':
-                for polygon in geom['coordinates']:
-                    coords = polygon[0]
-                    all_coords.extend(coords)
-        
-        if not all_coords:
-            return None
-            
-        lngs = [coord[0] for coord in all_coords]
-        lats = [coord[1] for coord in all_coords]
-        
-        return {
-            'min_lat': min(lats),
-            'max_lat': max(lats),
-            'min_lng': min(lngs),
-            'max_lng': max(lngs)
-        }
-
-    # Determine map center, zoom, and bounds based on filters
-    indonesia_sw = [-11.0, 94.0]
-    indonesia_ne = [6.0, 141.0]
-    map_center = [-2.5, 118.0]
-    zoom_level = 4
-    map_bounds = [[indonesia_sw[0], indonesia_sw[1]], [indonesia_ne[0], indonesia_ne[1]]]
-    
-    if province_filter and province_filter != 'Semua':
-        # Find the specific province in geojson
-        province_geojson_name = reverse_mapping.get(province_filter)
-        if province_geojson_name:
-            province_features = [f for f in geojson_data['features'] 
-                               if f['properties']['Propinsi'] == province_geojson_name]
-            if province_features:
-                bounds = get_bounds_for_features(province_features)
-                if bounds:
-                    map_center = [(bounds['min_lat'] + bounds['max_lat']) / 2, 
-                                 (bounds['min_lng'] + bounds['max_lng']) / 2]
-                    zoom_level = 7
-                    # Add padding to bounds
-                    padding = 0.5
-                    map_bounds = [[bounds['min_lat'] - padding, bounds['min_lng'] - padding],
-                                 [bounds['max_lat'] + padding, bounds['max_lng'] + padding]]
-    
-    elif region_filter and region_filter != 'Semua':
-        # Find all provinces in the region
-        region_provinces = map_data[map_data['Region'] == region_filter]['Provinsi'].unique()
-        region_geojson_names = [reverse_mapping.get(prov) for prov in region_provinces if reverse_mapping.get(prov)]
-        
-        if region_geojson_names:
-            region_features = [f for f in geojson_data['features'] 
-                             if f['properties']['Propinsi'] in region_geojson_names]
-            if region_features:
-                bounds = get_bounds_for_features(region_features)
-                if bounds:
-                    map_center = [(bounds['min_lat'] + bounds['max_lat']) / 2, 
-                                 (bounds['min_lng'] + bounds['max_lng']) / 2]
-                    zoom_level = 6
-                    # Add padding to bounds
-                    padding = 1.0
-                    map_bounds = [[bounds['min_lat'] - padding, bounds['min_lng'] - padding],
-                                 [bounds['max_lat'] + padding, bounds['max_lng'] + padding]]
-
-    # Create map with dynamic center and zoom
-    m = folium.Map(
-        location=map_center,
-        zoom_start=zoom_level,
-        tiles=None,
-        min_zoom=4,
-        max_zoom=10,
-        zoom_control=False,
-        scrollWheelZoom=True,
-        doubleClickZoom=True,
-        prefer_canvas=True,
-        attributionControl=True
-    )
-    
-    # Add custom CSS to force dark background and fix styling issues
-    custom_css = """
-    <style>
-    /* Force all map containers to have dark background */
-    .folium-map, .leaflet-container {
-        background-color: #25262d !important;
-        border-radius: 0.75rem !important;
-        overflow: hidden !important;
-    }
-    
-    /* Hide all tile layers and ensure dark background */
-    .leaflet-tile-pane {
-        display: none !important;
-    }
-    
-    /* Style all panes with dark background */
-    .leaflet-pane, 
-    .leaflet-map-pane,
-    .leaflet-overlay-pane,
-    .leaflet-shadow-pane,
-    .leaflet-marker-pane,
-    .leaflet-tooltip-pane,
-    .leaflet-popup-pane {
-        background-color: #25262d !important;
-    }
-    
-    /* Style zoom controls */
-    .leaflet-control-zoom {
-        border: none !important;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.3) !important;
-    }
-    
-    .leaflet-control-zoom a {
-        background-color: #25262d !important;
-        color: white !important;
-        border: 1px solid #444 !important;
-        text-decoration: none !important;
-    }
-    
-    .leaflet-control-zoom a:hover {
-        background-color: #3a3b42 !important;
-        color: white !important;
-    }
-    
-    /* Style attribution */
-    .leaflet-control-attribution {
-        background-color: rgba(37, 38, 45, 0.9) !important;
-        color: white !important;
-        border-radius: 4px !important;
-        font-size: 10px !important;
-    }
-    
-    .leaflet-control-attribution a {
-        color: #ccc !important;
-    }
-    
-    /* Remove any black backgrounds */
-    .leaflet-container::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        bottom: 0;
-        background-color: #25262d;
-        z-index: -1;
-    }
-    
-    /* Style colormap legend with light text - Selective targeting */
-    .colormap-container, .legend, 
-    div.legend, div.colormap-container {
-        background-color: rgba(37, 38, 45, 0.95) !important;
-        border-radius: 8px !important;
-        padding: 8px !important;
-        border: none !important;
-        color: #ffffff !important;
-        font-family: 'Arial', sans-serif !important;
-    }
-    
-    /* Don't style .colormap directly - preserve gradients */
-    
-    /* Super specific legend text targeting - exclude colormap */
-    .leaflet-control-container .legend,
-    .leaflet-control-container .colormap-container,
-    .leaflet-control .legend,
-    .leaflet-control .colormap-container {
-        background-color: rgba(37, 38, 45, 0.95) !important;
-        color: #ffffff !important;
-        border: none !important;
-    }
-    
-    /* Target only text elements in legends, NOT the colormap gradient */
-    .legend *, .colormap-container *,
-    .leaflet-control .legend *, .leaflet-control .colormap-container *,
-    .legend div, .colormap-container div,
-    .legend span, .colormap-container span,
-    .legend p, .colormap-container p,
-    .legend text, .colormap-container text {
-        color: #ffffff !important;
-    }
-    
-    /* Target SVG text elements specifically */
-    .legend text, .colormap-container text {
-        fill: #ffffff !important;
-    }
-    
-    /* Preserve colormap gradient - DO NOT override colors for these */
-    .colormap .leaflet-control-colorpicker,
-    .colormap .leaflet-control-colorpicker *,
-    .colormap img,
-    .colormap canvas,
-    .colormap svg rect,
-    .colormap svg path,
-    .colormap .leaflet-control-colorpicker-gradient {
-        color: inherit !important;
-        fill: inherit !important;
-        background: inherit !important;
-    }
-    
-    /* Specific element targeting - only text elements */
-    .colormap-container .caption, .legend .caption,
-    .legend-title, .colormap-container-title {
-        color: #ffffff !important;
-        font-weight: bold !important;
-        font-size: 12px !important;
-        margin-bottom: 4px !important;
-    }
-    
-    .colormap-container .colorbar, .legend .colorbar {
-        border: none !important;
-        border-radius: 4px !important;
-    }
-    
-    .colormap-container .tick, .legend .tick,
-    .legend-scale, .colormap-container-scale {
-        color: #ffffff !important;
-        font-size: 10px !important;
-        font-weight: normal !important;
-    }
-    
-    /* Nuclear option - but EXCLUDE colormap gradients */
-    [class*="legend"] *:not(img):not(canvas):not([class*="gradient"]):not([class*="colorpicker"]) {
-        color: #ffffff !important;
-    }
-    
-    [class*="legend"] text, .legend text, .colormap-container text {
-        fill: #ffffff !important;
-    }
-    </style>
-    """
-    m.get_root().html.add_child(folium.Element(custom_css))
-
-    # Add JavaScript to properly configure the map with dynamic bounds
-    map_config_js = f'''
-        <script>
-        // Wait for map to be ready
-        document.addEventListener('DOMContentLoaded', function() {{
-            setTimeout(function() {{
-                var mapContainer = document.querySelector('.folium-map');
-                if (mapContainer && window[mapContainer.id]) {{
-                    var map = window[mapContainer.id];
-                    
-                    // Set bounds based on filter
-                    var bounds = [[{map_bounds[0][0]}, {map_bounds[0][1]}], [{map_bounds[1][0]}, {map_bounds[1][1]}]];
-                    map.setMaxBounds(bounds);
-                    
-                    // Set zoom level and limits based on filter
-                    map.setZoom({zoom_level});
-                    map.setMinZoom({max(4, zoom_level - 2)});
-                    map.setMaxZoom({zoom_level + 3});
-                    
-                    // Enable appropriate controls based on filter
-                    {"// Province/region filtered - enable some zoom controls" if (province_filter and province_filter != 'Semua') or (region_filter and region_filter != 'Semua') else "// All Indonesia - disable zoom controls"}
-                    {"map.scrollWheelZoom.enable();" if (province_filter and province_filter != 'Semua') or (region_filter and region_filter != 'Semua') else "map.scrollWheelZoom.disable();"}
-                    {"map.doubleClickZoom.enable();" if (province_filter and province_filter != 'Semua') or (region_filter and region_filter != 'Semua') else "map.doubleClickZoom.disable();"}
-                    map.touchZoom.{"enable" if (province_filter and province_filter != 'Semua') or (region_filter and region_filter != 'Semua') else "disable"}();
-                    map.boxZoom.disable();
-                    map.keyboard.disable();
-                    
-                    // Force dark background
-                    var container = map.getContainer();
-                    if (container) {{
-                        container.style.backgroundColor = '#25262d';
-                        container.style.borderRadius = '0.75rem';
-                    }}
-                    
-                    // Ensure map stays within bounds and cannot be dragged outside
-                    map.on('drag', function() {{
-                        map.panInsideBounds(bounds, {{animate: false}});
-                    }});
-                    
-                    // Control zoom limits
-                    map.on('zoom', function(e) {{
-                        var currentZoom = map.getZoom();
-                        if (currentZoom < {max(4, zoom_level - 2)}) {{
-                            map.setZoom({max(4, zoom_level - 2)});
-                        }} else if (currentZoom > {zoom_level + 3}) {{
-                            map.setZoom({zoom_level + 3});
-                        }}
-                    }});
-                    
-                    // Ultra-aggressive legend styling for white text
-                    function applyLegendStyling() {{
-                        // Style all legend containers
-                        var legendContainers = document.querySelectorAll('.legend, .colormap, .colormap-container');
-                        legendContainers.forEach(function(container) {{
-                            container.style.backgroundColor = 'rgba(37, 38, 45, 0.95)';
-                            container.style.color = '#ffffff';
-                            container.style.border = 'none';
-                            container.style.borderRadius = '8px';
-                            container.style.padding = '8px';
-                        }});
-                        
-                        // Force white color on text elements only, preserve colormap gradients
-                        var textSelectors = [
-                            '.legend', 
-                            '.colormap-container',
-                            '[class*="legend"]:not([class*="gradient"]):not([class*="colorpicker"])'
-                        ];
-                        
-                        textSelectors.forEach(function(selector) {{
-                            try {{
-                                var containers = document.querySelectorAll(selector);
-                                containers.forEach(function(container) {{
-                                    // Only target text nodes and text elements, not gradient elements
-                                    var textElements = container.querySelectorAll('div, span, p, text, *:not(img):not(canvas):not([class*="gradient"]):not([class*="colorpicker"])');
-                                    textElements.forEach(function(element) {{
-                                        // Skip elements that are likely colormap gradients
-                                        if (!element.classList.contains('leaflet-control-colorpicker') && 
-                                            !element.classList.contains('gradient') &&
-                                            element.tagName !== 'IMG' &&
-                                            element.tagName !== 'CANVAS') {{
-                                            
-                                            // Set text color
-                                            element.style.color = '#ffffff';
-                                            element.style.setProperty('color', '#ffffff', 'important');
-                                            
-                                            // Set SVG fill for text elements only
-                                            if (element.tagName === 'text' || element.tagName === 'TEXT') {{
-                                                element.style.fill = '#ffffff';
-                                                element.style.setProperty('fill', '#ffffff', 'important');
-                                                element.setAttribute('fill', '#ffffff');
-                                            }}
-                                        }}
-                                    }});
-                                }});
-                            }} catch(e) {{
-                                // Ignore selector errors
-                            }}
-                        }});
-                        
-                        // Specifically handle caption and tick elements
-                        var specificElements = document.querySelectorAll('.caption, .legend-title, .tick, .legend-scale');
-                        specificElements.forEach(function(element) {{
-                            element.style.color = '#ffffff';
-                            element.style.setProperty('color', '#ffffff', 'important');
-                        }});
-                    }}
-                    
-                    // Apply styling multiple times with increasing delays
-                    setTimeout(applyLegendStyling, 100);
-                    setTimeout(applyLegendStyling, 500);
-                    setTimeout(applyLegendStyling, 1000);
-                    setTimeout(applyLegendStyling, 2000);
-                    
-                    // Set up a mutation observer to catch any dynamically added legend elements
-                    if (typeof MutationObserver !== 'undefined') {{
-                        var observer = new MutationObserver(function(mutations) {{
-                            var shouldRestyle = false;
-                            mutations.forEach(function(mutation) {{
-                                if (mutation.type === 'childList' && mutation.addedNodes.length > 0) {{
-                                    for (var i = 0; i < mutation.addedNodes.length; i++) {{
-                                        var node = mutation.addedNodes[i];
-                                        if (node.nodeType === Node.ELEMENT_NODE && 
-                                            (node.classList.contains('legend') || 
-                                             node.classList.contains('colormap') || 
-                                             node.classList.contains('colormap-container') ||
-                                             node.querySelector('.legend, .colormap, .colormap-container'))) {{
-                                            shouldRestyle = true;
-                                            break;
-                                        }}
-                                    }}
-                                }}
-                            }});
-                            if (shouldRestyle) {{
-                                setTimeout(applyLegendStyling, 50);
-                            }}
-                        }});
-                        
-                        observer.observe(document.body, {{
-                            childList: true,
-                            subtree: true
-                        }});
-                    }}
-                    
-                    // Store map reference
-                    window._last_folium_map = map;
-                }}
-            }}, 200);
-        }});
-        </script>
-    '''
-    m.get_root().html.add_child(Element(map_config_js))
-    
-    # Add dark background rectangle to cover visible area
-    # Adjust background size based on zoom level
-    bg_padding = 5.0 if zoom_level <= 5 else 2.0
-    background_bounds = [
-        [map_bounds[0][0] - bg_padding, map_bounds[0][1] - bg_padding],
-        [map_bounds[1][0] + bg_padding, map_bounds[1][1] + bg_padding]
-    ]
-    
-    folium.Rectangle(
-        bounds=background_bounds,
-        color="#25262d",
-        fill=True,
-        fillColor="#25262d",
-        fillOpacity=1.0,
-        weight=0,
-        popup=None,
-        tooltip=None,
-        interactive=False
-    ).add_to(m)
+            font_color='white',
+            margin=dict(l=20, r=20, t=40, b=20)
+        )
+        return fig
+    return None
 
-    if len(map_data) > 0:
-        # Always exclude 'INDONESIA' (national aggregate) from all province-based calculations and coloring
-        map_data = map_data[map_data['Provinsi'] != 'INDONESIA'] if 'INDONESIA' in map_data['Provinsi'].values else map_data
-        
-        min_val = map_data[metric_col].min()
-        max_val = map_data[metric_col].max()
+def create_trend_chart(df_time_series):
+    """Create trend chart for crime data over time"""
+    if df_time_series is not None and not df_time_series.empty:
+        # Get Indonesia data
+        indonesia_data = df_time_series[
+            (df_time_series['province_id'] == NATIONAL_PROVINCE[0]) & df_time_series['Tahun'].between(2012, 2023)
+        ].dropna(subset=['Tindak Pidana'])
         
-        # Choose appropriate color scheme based on metric
-        if metric == 'Crime Rate 2023':
-            # Red scale for crime (bad = high values = red)
-            colormap = cm.LinearColormap(
-                colors=['#ffffcc', '#ff4444'],
-                vmin=min_val,
-                vmax=max_val
-            )
-        elif metric == 'Gini Ratio':
-            # Red scale for inequality (bad = high values = red)
-            colormap = cm.LinearColormap(
-                colors=['#ffffcc', '#ff4444'],
-                vmin=min_val,
-                vmax=max_val
-            )
-        elif metric == 'Education':
-            # Green scale for education (good = high values = green)
-            colormap = cm.LinearColormap(
-                colors=['#ffcccc', '#44ff44'],
-                vmin=min_val,
-                vmax=max_val
-            )
-        elif metric == 'Income':
-            # Blue scale for income (neutral metric)
-            colormap = cm.LinearColormap(
-                colors=['#ccccff', '#4444ff'],
-                vmin=min_val,
-                vmax=max_val
-            )
-        elif metric == 'Population':
-            # Purple scale for population (neutral metric)
-            colormap = cm.LinearColormap(
-                colors=['#e6ccff', '#8844ff'],
-                vmin=min_val,
-                vmax=max_val
-            )
-        else:
-            # Default to yellow-red scale
-            colormap = cm.LinearColormap(
-                colors=['#ffffcc', '#ff4444'],
-                vmin=min_val,
-                vmax=max_val
+        if not indonesia_data.empty:
+            trend_df = (
+                indonesia_data.sort_values('Tahun')
+                .rename(columns={'Tahun': 'Year', 'Tindak Pidana': 'Crime_Rate'})[['Year', 'Crime_Rate']]
             )
-        colormap.caption = title  # Add a caption to the legend
-        # Add the colormap legend to the map
-        colormap.add_to(m)
-        province_data = {}
-        region_data = {}
-        for _, row in map_data.iterrows():
-            geojson_name = reverse_mapping.get(row['Provinsi'])
-            if geojson_name:
-                province_data[geojson_name] = row[metric_col]
-                region_data[geojson_name] = row['Region']
-        # print(f"[DEBUG] province_data sample: {list(province_data.items())[:5]}")
-        # Determine which provinces to highlight
-        def highlight_feature(feature):
-            prov_name = feature['properties']['Propinsi']
-            region_name = region_data.get(prov_name)
             
-            # Get the appropriate maximum color based on metric
-            if metric == 'Education':
-                max_color = '#44ff44'  # Green for education
-            elif metric == 'Income':
-                max_color = '#4444ff'  # Blue for income
-            elif metric == 'Population':
-                max_color = '#8844ff'  # Purple for population
-            else:  # Crime Rate, Gini Ratio, and default
-                max_color = '#ff4444'  # Red for crime/inequality
+            fig = px.line(
+                trend_df, 
+                x='Year', 
+                y='Crime_Rate',
+                title="Tren Tingkat Kriminalitas Indonesia (2012-2023)",
+                markers=True
+            )
             
-            # Province filter takes precedence
-            if province_filter and province_filter != 'Semua':
-                if prov_name == reverse_mapping.get(province_filter):
-                    # Use the colormap's maximum color for the selected province
-                    return {
-                        'fillColor': max_color,
-                        'color': 'black',
-                        'weight': 3,
-                        'fillOpacity': 1.0,
-                    }
-                else:
-                    return {
-                        'fillColor': '#cccccc',
-                        'color': '#bbbbbb',
-                        'weight': 1,
-                        'fillOpacity': 0.2,
-                    }
-            elif region_filter and region_filter != 'Semua':
-                if region_name == region_filter:
-                    return {
-                        'fillColor': colormap(province_data.get(prov_name, min_val)),
-                        'color': 'black',
-                        'weight': 1.5,
-                        'fillOpacity': 0.8,
-                    }
-                else:
-                    return {
-                        'fillColor': '#cccccc',
-                        'color': '#bbbbbb',
-                        'weight': 1,
-                        'fillOpacity': 0.3,
-                    }
-            else:
-                return {
-                    'fillColor': colormap(province_data.get(prov_name, min_val)),
-                    'color': 'black',
-                    'weight': 1,
-                    'fillOpacity': 0.7,
-                }
-
-        # Add tooltip with value for each province
-        folium.GeoJson(
-            geojson_data,
-            style_function=highlight_feature,
-            tooltip=folium.features.GeoJsonTooltip(
-                fields=['Propinsi'],
-                aliases=['Province:'],
-                localize=True,
-                labels=False,
-                sticky=True,
-                toLocaleString=True,
-                style=("background-color: white; color: #333; font-weight: bold; border-radius: 4px; padding: 4px;"),
-                parse_html=True,
-                # Custom function for tooltip content is not supported directly, so we use the following workaround:
-                # We'll add the value to the feature properties before passing to GeoJson
-            ),
-            popup=None
-        ).add_to(m)
-
-        # Workaround: Add value to each feature's properties for tooltip
-        for feature in geojson_data['features']:
-            prov_name = feature['properties']['Propinsi']
-            value = province_data.get(prov_name, None)
-            if value is not None:
-                feature['properties']['_tooltip'] = f"<b>{prov_name}</b><br>{value:,.2f}"
-            else:
-                feature['properties']['_tooltip'] = f"<b>{prov_name}</b><br>N/A"
-
-        # Now re-add the GeoJson with the custom tooltip field
-        folium.GeoJson(
-            geojson_data,
-            style_function=highlight_feature,
-            tooltip=folium.features.GeoJsonTooltip(
-                fields=['_tooltip'],
-                aliases=[''],
-                localize=True,
-                labels=False,
-                sticky=True,
-                parse_html=True,
-                style=("background-color: white; color: #333; font-weight: bold; border-radius: 4px; padding: 4px;")
-            ),
-            popup=folium.features.GeoJsonPopup(
-                fields=['_tooltip'],
-                aliases=[''],
-                localize=True,
-                labels=False,
-                parse_html=True,
-                style=("background-color: white; color: #333; font-weight: bold; border-radius: 4px; padding: 4px;")
+            fig.update_layout(
+                height=400,
+                xaxis_title="Tahun",
+                yaxis_title="Tingkat Kriminalitas (per 100.000 penduduk)",
+                plot_bgcolor='#25262d',
+                paper_bgcolor='#25262d',
+                font_color='white',
+                margin=dict(l=20, r=20, t=40, b=20)
             )
-        ).add_to(m)
-    
-    # Add CSS to make iframe body transparent (targeting from inside the iframe)
-    iframe_transparency_css = """
-    <style>
-    /* Target the body element that contains the folium map root */
-    body {
-        background-color: transparent !important;
-        background: transparent !important;
-    }
-    
-    /* Ensure the html element is also transparent */
-    html {
-        background-color: transparent !important;
-        background: transparent !important;
-    }
+            
+            return fig
     
-    /* Make sure the folium map container itself maintains the dark theme */
-    .folium-map {
-        background-color: #25262d !important;
-    }
-    </style>
+    return None
+
+def create_regional_comparison(df):
+    """Create regional comparison charts"""
+    if 'Region' in df.columns:
+        # Group by region and calculate means
+        regional_stats = df.groupby('Region').agg({
+            col: 'mean' for col in df.select_dtypes(include=[np.number]).columns
+            if col not in ['Provinsi', 'province_id']
+        }).round(2)
+        
+        return regional_stats
+    return None
+
+# --- Choropleth Classification ---
+
+# Per metric: data column, legend caption, and the low/high colours of its scale
+CHOROPLETH_METRICS = {
+    'Crime Rate 2023': {
+        'column': 'Tindak Pidana 2023',
+        'title': 'Tindak Pidana per 100,000 Penduduk (2023)',
+        'colors': ('#ffffcc', '#ff4444'),  # Red scale for crime (bad = high values = red)
+    },
+    'Population': {
+        'column': 'Jumlah Penduduk',
+        'title': 'Populasi berdasarkan Provinsi (ribu jiwa, 2023)',
+        'colors': ('#e6ccff', '#8844ff'),  # Purple scale for population (neutral metric)
+    },
+    'Gini Ratio': {
+        'column': 'gini_ratio_2023',
+        'title': 'Gini Ratio berdasarkan Provinsi (2023)',
+        'colors': ('#ffffcc', '#ff4444'),  # Red scale for inequality (bad = high values = red)
+    },
+    'Income': {
+        'column': 'Pendapatan Agustus',
+        'title': 'Average Income by Province (August 2023)',
+        'colors': ('#ccccff', '#4444ff'),  # Blue scale for income (neutral metric)
+    },
+    'Education': {
+        'column': 'Pendidikan Terakhir SMA/PT',
+        'title': 'Tingkat Penyelesaian Pendidikan SMA berdasarkan Provinsi (2023)',
+        'colors': ('#ffcccc', '#44ff44'),  # Green scale for education (good = high values = green)
+    },
+}
+DEFAULT_CHOROPLETH_METRIC = 'Crime Rate 2023'
+
+# Colour classification schemes and their sidebar labels; 'linear' is a continuous scale
+CLASSIFICATION_SCHEMES = {
+    'linear': 'Linear (gradasi)',
+    'quantile': 'Kuantil',
+    'jenks': 'Jenks (natural breaks)',
+    'equal_interval': 'Interval sama',
+}
+CHOROPLETH_CLASSES = 5
+
+def jenks_breaks(values, classes):
+    """Jenks natural breaks: the class boundaries minimising the within-class squared deviation
+    (Fisher's exact dynamic programme over the sorted values)"""
+    x = np.sort(values)
+    n = len(x)
+    # ssd[i, j]: squared deviation of x[i..j] around its mean, from prefix sums
+    s1 = np.r_[0.0, np.cumsum(x)]
+    s2 = np.r_[0.0, np.cumsum(x * x)]
+    i, j = np.triu_indices(n)
+    ssd = np.full((n, n), np.inf)
+    ssd[i, j] = (s2[j + 1] - s2[i]) - (s1[j + 1] - s1[i]) ** 2 / (j - i + 1)
+
+    cost = ssd[0].copy()
+    starts = []
+    for _ in range(1, classes):
+        # total[i, j]: best split of x[..i-1] into the previous classes plus x[i..j] as the last one
+        total = np.full((n, n), np.inf)
+        total[1:, :] = cost[:-1, None] + ssd[1:, :]
+        start = total.argmin(axis=0)
+        cost = total[start, np.arange(n)]
+        starts.append(start)
+
+    # Walk back from the last value to recover where each class starts
+    firsts = [0]
+    last = n - 1
+    for start in reversed(starts):
+        firsts.append(start[last])
+        last = firsts[-1] - 1
+    return np.r_[x[sorted(firsts)], x[-1]]
+
+def classify_values(values, scheme='linear', classes=CHOROPLETH_CLASSES):
+    """Class breaks for a scheme: None for the continuous linear scale, else the lower bound of
+    every class followed by the maximum. Classes are half-open, [breaks[i], breaks[i + 1]), with
+    the last one closed; fewer classes when values repeat."""
+    values = values[~np.isnan(values)]
+    if scheme == 'linear' or len(values) == 0:
+        return None
+    classes = min(classes, len(np.unique(values)))
+    if scheme == 'quantile':
+        breaks = np.quantile(values, np.linspace(0, 1, classes + 1))
+    elif scheme == 'jenks':
+        breaks = jenks_breaks(values, max(classes, 1))
+    elif scheme == 'equal_interval':
+        breaks = np.linspace(values.min(), values.max(), classes + 1)
+    else:
+        raise ValueError(f"Unknown classification scheme: {scheme}")
+    # A repeated lower bound would only leave an empty class; the maximum may equal the last one
+    return np.r_[np.unique(breaks[:-1]), breaks[-1]]
+
+def interpolate_colors(low, high, positions):
+    """'#RRGGBBAA' colours at positions in [0, 1] along a two-colour linear scale"""
+    low, high = (np.array(mcolors.to_rgba(color)) for color in (low, high))
+    rgba = (1.0 - positions[:, None]) * low + positions[:, None] * high
+    channels = (rgba * 255.9999).astype(int)
+    return np.array(['#%02x%02x%02x%02x' % tuple(channel) for channel in channels.tolist()], dtype=object)
+
+def class_colors(colors, breaks):
+    """One colour per class, evenly spaced along the scale"""
+    classes = len(breaks) - 1
+    return interpolate_colors(*colors, np.linspace(0, 1, classes) if classes > 1 else np.ones(1))
+
+def value_colors(values, colors, vmin, vmax, breaks=None):
+    """Fill colour for every value in one pass; missing values take the low end of the scale"""
+    values = np.where(np.isnan(values), vmin, values)
+    if breaks is None:
+        span = vmax - vmin
+        positions = np.clip((values - vmin) / span, 0, 1) if span > 0 else np.zeros(len(values))
+        return interpolate_colors(*colors, positions)
+    # Classes are half-open, so a value on a break starts the class above it, as in the legend
+    return class_colors(colors, breaks)[np.searchsorted(breaks[1:-1], values, side='right')]
+
+def choropleth_styles(province_ids, values, regions, colors, vmin, vmax, breaks=None,
+                      region_filter=None, selected_province_id=None):
+    """Leaflet style for every province, as a table indexed by province_id
+
+    A selected province is drawn in the scale's top colour with the rest greyed out; with a
+    region filter only that region is coloured.
     """
-    m.get_root().html.add_child(folium.Element(iframe_transparency_css))
-    
-    return m
+    styles = pd.DataFrame({
+        'fillColor': value_colors(values, colors, vmin, vmax, breaks),
+        'color': 'black',
+        'weight': 1.0,
+        'fillOpacity': 0.7,
+    }, index=pd.Index(province_ids, name='province_id'))
+    if selected_province_id is not None:
+        selected = styles.index == selected_province_id
+        styles.loc[selected] = [colors[1], 'black', 3.0, 1.0]
+        styles.loc[~selected] = ['#cccccc', '#bbbbbb', 1.0, 0.2]
+    elif region_filter and region_filter != 'Semua':
+        in_region = np.asarray(regions == region_filter)
+        styles.loc[in_region, ['weight', 'fillOpacity']] = [1.5, 0.8]
+        styles.loc[~in_region] = ['#cccccc', '#bbbbbb', 1.0, 0.3]
+    return styles
+
+def choropleth_spec(df, metric, map_geometry, region_filter=None, province_filter=None, scheme='linear'):
+    """Everything that differs between choropleth maps for a metric and filter: the opening view,
+    the geometry level, the legend and a style and tooltip per province. Plain JSON, so the map
+    component can restyle an existing map with it."""
+    metric_spec = CHOROPLETH_METRICS.get(metric, CHOROPLETH_METRICS[DEFAULT_CHOROPLETH_METRIC])
+    metric_col = metric_spec['column']
+    map_data = df[['province_id', 'Provinsi', metric_col, 'Region']].dropna(subset=['Provinsi'])
+
+    selected_province_id = province_id_for_name(province_filter) if province_filter and province_filter != 'Semua' else None
+
+    # Determine map center, zoom, and bounds based on filters
+    view = dict(map_view(map_geometry['views'], region_filter, province_filter))
+    zoom_level = view['zoom']
+    is_filtered = bool((province_filter and province_filter != 'Semua') or (region_filter and region_filter != 'Semua'))
+    # Zoom limits around the opening zoom; zooming is only enabled on a filtered map
+    view.update(min_zoom=max(4, zoom_level - 2), max_zoom=zoom_level + 3, interactive=is_filtered)
+
+    spec = {
+        'level': geometry_level_for_view(region_filter, province_filter),
+        'view': view,
+        'legend': None,
+        'attributes': {},
+    }
+
+    if len(map_data) > 0:
+        # Always exclude 'INDONESIA' (national aggregate) from all province-based calculations and coloring
+        map_data = map_data[map_data['province_id'] != NATIONAL_PROVINCE[0]]
+        min_val = map_data[metric_col].min()
+        max_val = map_data[metric_col].max()
+        colors = metric_spec['colors']
+        breaks = classify_values(map_data[metric_col].to_numpy(dtype=float), scheme)
+
+        spec['legend'] = {
+            'caption': metric_spec['title'],
+            'colors': list(colors) if breaks is None else [color[:7] for color in class_colors(colors, breaks)],
+            'vmin': float(min_val),
+            'vmax': float(max_val),
+            'breaks': None if breaks is None else breaks.tolist(),
+        }
+
+        # Values and regions aligned to the geometry's provinces; provinces outside the data are NaN
+        province_ids = pd.Index(map_geometry['province_ids'])
+        aligned = map_data.set_index('province_id').reindex(province_ids)
+        values = aligned[metric_col].to_numpy(dtype=float)
+        styles = choropleth_styles(
+            province_ids, values, aligned['Region'].to_numpy(dtype=object), colors, min_val, max_val, breaks,
+            region_filter=region_filter, selected_province_id=selected_province_id,
+        )
+
+        # Per-province style and tooltip, joined onto the shared geometry in the browser
+        names = build_province_dimension().set_index('province_id')['Provinsi'].reindex(province_ids)
+        tooltips = [
+            f"<b>{name}</b><br>{value:,.2f}" if not np.isnan(value) else f"<b>{name}</b><br>N/A"
+            for name, value in zip(names.tolist(), values.tolist())
+        ]
+        spec['attributes'] = {
+            province_id: {'style': style, 'tooltip': tooltip}
+            for province_id, style, tooltip in zip(province_ids.tolist(), styles.to_dict('records'), tooltips)
+        }
+
+    return spec
+
+choropleth_component = components.declare_component("choropleth_map", path=MAP_COMPONENT_DIR)
+
+def render_choropleth_map(spec, map_geometry, height, key):
+    """Draw a choropleth spec in the map component. The component keeps its Leaflet map and the
+    fetched geometry (or vector tiles) across reruns, so a filter change only sends the spec."""
+    level = spec['level']
+    published = map_geometry['urls'] is not None
+    choropleth_component(
+        spec=spec,
+        geometry_url=map_geometry['urls'][level] if published else None,
+        # Without published files the geometry travels with the render, identified by version and level
+        geometry=None if published else map_geometry['levels'][level],
+        geometry_key=f"{map_geometry['version']}-{level}",
+        tiles_url=map_geometry['tiles_url'],
+        height=height, key=key, default=None
+    )
 
 # --- Visualization Components Modularization ---
 
-def render_key_metrics(df_filtered, selected_province, oc_data=None, selected_region=None, df_main=None):
+def render_key_metrics(aggregate, selected_province, oc_data=None, selected_region=None):
     # Check if province or region filter is active
     is_filtered = selected_province != 'Semua' or selected_region != 'Semua'
     
-    if is_filtered and df_main is not None:
+    if is_filtered and aggregate is not None:
         # Show provincial/regional data instead of OC Index
-        render_provincial_metrics(df_filtered, selected_province, selected_region, df_main)
-    elif oc_data and oc_data['indonesia_2023'] is not None:
+        render_provincial_metrics(aggregate, selected_province, selected_region)
+    elif oc_data and not oc_data['home'].empty:
         # Create columns for horizontal layout of metrics
         col1, col2, col3, col4 = st.columns(4)
         
-        indonesia_2023 = oc_data['indonesia_2023']
-        indonesia_2021 = oc_data['indonesia_2021']
+        # Compare the latest OC index edition with the one before it
+        home = oc_data['home']
+        indonesia_latest = home.iloc[-1]
+        indonesia_previous = home.iloc[-2] if len(home) > 1 else None
+        previous_year = home.index[-2] if len(home) > 1 else None
         
         # Crime Rate from OC Index
-        crime_rate_2023 = indonesia_2023['Criminality']
-        crime_rate_2021 = indonesia_2021['Criminality'] if indonesia_2021 is not None else None
+        crime_rate_latest = indonesia_latest['Criminality']
+        crime_rate_previous = indonesia_previous['Criminality'] if indonesia_previous is not None else None
         
         with col1:
-            if crime_rate_2021 is not None:
-                crime_rate_change = crime_rate_2023 - crime_rate_2021  # Positive = worse (crime increased), Negative = better (crime decreased)
+            if crime_rate_previous is not None:
+                crime_rate_change = crime_rate_latest - crime_rate_previous  # Positive = worse (crime increased), Negative = better (crime decreased)
                 if abs(crime_rate_change) >= 0.01: # Only show change if significant (>= 0.01)
                     st.metric(
                         "Tingkat Kriminalitas (OC Index)", 
-                        f"{crime_rate_2023:.2f}",
-                        delta=f"{crime_rate_change:+.2f} dari 2021",
+                        f"{crime_rate_latest:.2f}",
+                        delta=f"{crime_rate_change:+.2f} dari {previous_year}",
                         delta_color="inverse",  # inverse because higher crime rate is worse
                         help="Skor Indeks Kejahatan Terorganisir (0-10, Semakin tinggi semakin buruk)"
                     )
                 else:
                     st.metric(
                         "Tingkat Kriminalitas (OC Index)", 
-                        f"{crime_rate_2023:.2f}",
-                        delta="Sama dengan 2021",
+                        f"{crime_rate_latest:.2f}",
+                        delta=f"Sama dengan {previous_year}",
                         delta_color="off",
                         help="Skor Indeks Kejahatan Terorganisir (0-10, Semakin tinggi semakin buruk)"
                     )
             else:
                 st.metric(
                     "Tingkat Kriminalitas (OC Index)", 
-                    f"{crime_rate_2023:.2f}",
+                    f"{crime_rate_latest:.2f}",
                     help="Skor Indeks Kejahatan Terorganisir (0-10, Semakin tinggi semakin buruk)"
                 )
         
         # World Rank
-        world_rank_2023 = int(indonesia_2023['World_Rank'])
-        world_rank_2021 = int(indonesia_2021['World_Rank']) if indonesia_2021 is not None else None
+        world_rank_latest = int(indonesia_latest['World_Rank'])
+        world_rank_previous = int(indonesia_previous['World_Rank']) if indonesia_previous is not None else None
         
         with col2:
-            if world_rank_2021 is not None:
-                rank_change = -(world_rank_2023 - world_rank_2021)  # Positive = worse (rank increased), Negative = better (rank decreased)
+            if world_rank_previous is not None:
+                rank_change = -(world_rank_latest - world_rank_previous)  # Positive = worse (rank increased), Negative = better (rank decreased)
                 if rank_change != 0:
                     st.metric(
                         "Peringkat Dunia", 
-                        f"#{world_rank_2023} / 193",
-                        delta=f"{rank_change:+d} dari 2021",
+                        f"#{world_rank_latest} / {indonesia_latest['World_Total']}",
+                        delta=f"{rank_change:+d} dari {previous_year}",
                         delta_color="inverse",  # inverse because lower rank is better
                         help="Peringkat global di antara semua negara (Peringkat rendah lebih baik)"
                     )
                 else:
                     st.metric(
                         "Peringkat Dunia", 
-                        f"#{world_rank_2023} / 193",
-                        delta="Sama dengan 2021",
+                        f"#{world_rank_latest} / {indonesia_latest['World_Total']}",
+                        delta=f"Sama dengan {previous_year}",
                         delta_color="off",
                         help="Peringkat global di antara semua negara (Peringkat rendah lebih baik)"
                     )
             else:
                 st.metric(
                     "Peringkat Dunia", 
-                    f"#{world_rank_2023} / 193",
+                    f"#{world_rank_latest} / {indonesia_latest['World_Total']}",
                     help="Peringkat global di antara semua negara (Peringkat rendah lebih baik)"
                 )
         
         # Asia Rank
-        asia_rank_2023 = int(indonesia_2023['Asia_Rank']) if pd.notna(indonesia_2023['Asia_Rank']) else None
-        asia_rank_2021 = int(indonesia_2021['Asia_Rank']) if indonesia_2021 is not None and pd.notna(indonesia_2021['Asia_Rank']) else None
+        asia_rank_latest = int(indonesia_latest['Continent_Rank']) if pd.notna(indonesia_latest['Continent_Rank']) else None
+        asia_rank_previous = int(indonesia_previous['Continent_Rank']) if indonesia_previous is not None and pd.notna(indonesia_previous['Continent_Rank']) else None
         
         with col3:
-            if asia_rank_2023 is not None:
-                if asia_rank_2021 is not None:
-                    asia_change = asia_rank_2023 - asia_rank_2021  # Positive = worse (rank increased), Negative = better (rank decreased)
+            if asia_rank_latest is not None:
+                if asia_rank_previous is not None:
+                    asia_change = asia_rank_latest - asia_rank_previous  # Positive = worse (rank increased), Negative = better (rank decreased)
                     if asia_change != 0:
                         st.metric(
                             "Peringkat Asia", 
-                            f"#{asia_rank_2023} / 46",
-                            delta=f"{asia_change:+d} dari 2021",
+                            f"#{asia_rank_latest} / {indonesia_latest['Continent_Total']}",
+                            delta=f"{asia_change:+d} dari {previous_year}",
                             delta_color="inverse",  # inverse because lower rank is better
                             help="Peringkat di antara negara-negara Asia (Peringkat rendah lebih baik)"
                         )
                     else:
                         st.metric(
                             "Peringkat Asia", 
-                            f"#{asia_rank_2023} / 46",
-                            delta="Sama dengan 2021",
+                            f"#{asia_rank_latest} / {indonesia_latest['Continent_Total']}",
+                            delta=f"Sama dengan {previous_year}",
                             delta_color="off",
                             help="Peringkat di antara negara-negara Asia (Peringkat rendah lebih baik)"
                         )
                 else:
                     st.metric(
                         "Peringkat Asia", 
-                        f"#{asia_rank_2023} / 46",
+                        f"#{asia_rank_latest} / {indonesia_latest['Continent_Total']}",
                         help="Peringkat di antara negara-negara Asia (Peringkat rendah lebih baik)"
                     )
         
         # ASEAN Rank
-        asean_rank_2023 = int(indonesia_2023['ASEAN_Rank']) if pd.notna(indonesia_2023['ASEAN_Rank']) else None
-        asean_rank_2021 = int(indonesia_2021['ASEAN_Rank']) if indonesia_2021 is not None and pd.notna(indonesia_2021['ASEAN_Rank']) else None
+        asean_rank_latest = int(indonesia_latest['ASEAN_Rank']) if pd.notna(indonesia_latest['ASEAN_Rank']) else None
+        asean_rank_previous = int(indonesia_previous['ASEAN_Rank']) if indonesia_previous is not None and pd.notna(indonesia_previous['ASEAN_Rank']) else None
         
         with col4:
-            if asean_rank_2023 is not None:
-                if asean_rank_2021 is not None:
-                    asean_change = asean_rank_2023 - asean_rank_2021  # Positive = worse (rank increased), Negative = better (rank decreased)
+            if asean_rank_latest is not None:
+                if asean_rank_previous is not None:
+                    asean_change = asean_rank_latest - asean_rank_previous  # Positive = worse (rank increased), Negative = better (rank decreased)
                     if asean_change != 0:
                         st.metric(
                             "Peringkat ASEAN", 
-                            f"#{asean_rank_2023} / 10",
-                            delta=f"{asean_change:+d} dari 2021",
+                            f"#{asean_rank_latest} / {indonesia_latest['ASEAN_Total']}",
+                            delta=f"{asean_change:+d} dari {previous_year}",
                             delta_color="inverse",  # inverse because lower rank is better
                             help="Peringkat di antara negara-negara ASEAN (Peringkat rendah lebih baik)"
                         )
                     else:
                         st.metric(
                             "Peringkat ASEAN", 
-                            f"#{asean_rank_2023} / 10",
-                            delta="Sama dengan 2021",
+                            f"#{asean_rank_latest} / {indonesia_latest['ASEAN_Total']}",
+                            delta=f"Sama dengan {previous_year}",
                             delta_color="off",
                             help="Peringkat di antara negara-negara ASEAN (Peringkat rendah lebih baik)"
                         )
                 else:
                     st.metric(
                         "Peringkat ASEAN", 
-                        f"#{asean_rank_2023} / 10",
+                        f"#{asean_rank_latest} / {indonesia_latest['ASEAN_Total']}",
                         help="Peringkat di antara negara-negara ASEAN (Peringkat rendah lebih baik)"
                     )
     else:
@@ -1343,77 +1898,156 @@ def render_key_metrics(df_filtered, selected_province, oc_data=None, selected_re
 
 def render_provincial_data_table(df_filtered):
     st.subheader("Data Provinsi Terperinci")
-    df_display = df_filtered.reset_index(drop=True)
+    df_display = df_filtered.drop(columns='province_id', errors='ignore').reset_index(drop=True)
     df_display.index = df_display.index + 1
     st.dataframe(df_display, use_container_width=True)
 
-@st.cache_data
-def load_oc_index_data():
-    """Load and process OC Index data for global crime rankings"""
+# --- OC Index Rankings ---
+
+OC_INDEX_GLOB = "oc_index_*.csv"
+OC_INDEX_PATTERN = re.compile(r"oc_index_(\d{4})\.csv$")
+OC_HOME_COUNTRY = 'Indonesia'
+# Every country is ranked worldwide and within each of these columns' groups...
+OC_GROUP_COLUMNS = ['Continent', 'Region']
+# ...and within every peer group it belongs to. Adding a group here adds a <name>_Rank column.
+OC_PEER_GROUPS = {
+    'ASEAN': ['Indonesia', 'Malaysia', 'Thailand', 'Vietnam', 'Philippines',
+              'Singapore', 'Myanmar', 'Cambodia', 'Laos', 'Brunei', 'Timor-Leste'],
+}
+
+def discover_oc_index_files(dataset_dir=DATASET_DIR):
+    """Find every OC index edition, keyed by year"""
+    editions = {}
+    for path in sorted(glob.glob(os.path.join(dataset_dir, OC_INDEX_GLOB))):
+        match = OC_INDEX_PATTERN.search(os.path.basename(path))
+        if match:
+            editions[int(match.group(1))] = path
+    return editions
+
+def rank_oc_index(df_oc):
+    """Add <scope>_Rank and <scope>_Total columns for the world, OC_GROUP_COLUMNS and OC_PEER_GROUPS
+    
+    Each row is repeated once per scope it belongs to and all scopes are ranked in a single
+    grouped pass (1 = highest criminality; tied scores share the better rank).
+    """
+    memberships = pd.concat(
+        [df_oc.assign(Scope='World', Group='World')]
+        + [df_oc.assign(Scope=col, Group=df_oc[col].astype('string')) for col in OC_GROUP_COLUMNS]
+        + [df_oc[df_oc['Country'].isin(members)].assign(Scope=name, Group=name) for name, members in OC_PEER_GROUPS.items()]
+    )
+    grouped = memberships.groupby(['Tahun', 'Scope', 'Group'], sort=False)['Criminality']
+    memberships['Rank'] = grouped.rank(method='min', ascending=False)
+    memberships['Total'] = grouped.transform('count')
+    
+    ranks = memberships.pivot(columns='Scope', values=['Rank', 'Total']).astype('Int16')
+    ranks.columns = [f"{scope}_{measure}" for measure, scope in ranks.columns]
+    return df_oc.join(ranks)
+
+@st.cache_data(max_entries=2)
+def load_oc_index_data(data_version=None):
+    """Load every OC index edition into one long table ranked across all scopes"""
     try:
-        # Load OC Index data
-        df_oc_2023 = pd.read_csv("dataset/oc_index_2023.csv", sep=';')
-        df_oc_2021 = pd.read_csv("dataset/oc_index_2021.csv", sep=';')
-        
-        # Clean criminality column - replace comma with dot for proper float conversion
-        df_oc_2023['Criminality'] = df_oc_2023['Criminality'].astype(str).str.replace(',', '.').astype(float)
-        df_oc_2021['Criminality'] = df_oc_2021['Criminality'].astype(str).str.replace(',', '.').astype(float)
-        
-        # Sort by criminality (higher = worse ranking)
-        df_oc_2023_sorted = df_oc_2023.sort_values('Criminality', ascending=False).reset_index(drop=True)
-        df_oc_2021_sorted = df_oc_2021.sort_values('Criminality', ascending=False).reset_index(drop=True)
-        
-        # Add rank columns (1 = highest criminality/worst)
-        df_oc_2023_sorted['World_Rank'] = df_oc_2023_sorted.index + 1
-        df_oc_2021_sorted['World_Rank'] = df_oc_2021_sorted.index + 1
-        
-        # Calculate Asia rankings
-        asia_2023 = df_oc_2023_sorted[df_oc_2023_sorted['Continent'] == 'Asia'].reset_index(drop=True)
-        asia_2023['Asia_Rank'] = asia_2023.index + 1
-        
-        asia_2021 = df_oc_2021_sorted[df_oc_2021_sorted['Continent'] == 'Asia'].reset_index(drop=True)
-        asia_2021['Asia_Rank'] = asia_2021.index + 1
-        
-        # Calculate ASEAN rankings (Indonesia's region)
-        asean_countries = ['Indonesia', 'Malaysia', 'Thailand', 'Vietnam', 'Philippines', 
-                          'Singapore', 'Myanmar', 'Cambodia', 'Laos', 'Brunei', 'Timor-Leste']
-        
-        asean_2023 = df_oc_2023_sorted[df_oc_2023_sorted['Country'].isin(asean_countries)].reset_index(drop=True)
-        asean_2023['ASEAN_Rank'] = asean_2023.index + 1
-        
-        asean_2021 = df_oc_2021_sorted[df_oc_2021_sorted['Country'].isin(asean_countries)].reset_index(drop=True)
-        asean_2021['ASEAN_Rank'] = asean_2021.index + 1
-        
-        # Merge Asia rankings back to main dataframes
-        df_oc_2023_sorted = df_oc_2023_sorted.merge(
-            asia_2023[['Country', 'Asia_Rank']], on='Country', how='left'
-        )
-        df_oc_2021_sorted = df_oc_2021_sorted.merge(
-            asia_2021[['Country', 'Asia_Rank']], on='Country', how='left'
-        )
-        
-        # Merge ASEAN rankings back to main dataframes
-        df_oc_2023_sorted = df_oc_2023_sorted.merge(
-            asean_2023[['Country', 'ASEAN_Rank']], on='Country', how='left'
-        )
-        df_oc_2021_sorted = df_oc_2021_sorted.merge(
-            asean_2021[['Country', 'ASEAN_Rank']], on='Country', how='left'
-        )
-        
-        # Get Indonesia data
-        indonesia_2023 = df_oc_2023_sorted[df_oc_2023_sorted['Country'] == 'Indonesia'].iloc[0] if len(df_oc_2023_sorted[df_oc_2023_sorted['Country'] == 'Indonesia']) > 0 else None
-        indonesia_2021 = df_oc_2021_sorted[df_oc_2021_sorted['Country'] == 'Indonesia'].iloc[0] if len(df_oc_2021_sorted[df_oc_2021_sorted['Country'] == 'Indonesia']) > 0 else None
+        editions = discover_oc_index_files()
+        sources = read_sources_concurrently({
+            year: partial(read_dataset, 'oc_index', path=path) for year, path in editions.items()
+        })
+        df_oc = pd.concat(
+            [df.assign(Tahun=year) for year, df in sources.items()], ignore_index=True
+        ).astype({'Tahun': 'int16', 'Continent': 'category', 'Region': 'category'})
+        df_oc = rank_oc_index(df_oc).sort_values(['Tahun', 'World_Rank'], ignore_index=True)
+        require_data_version(data_version)
         
         return {
-            'indonesia_2023': indonesia_2023,
-            'indonesia_2021': indonesia_2021,
-            'df_2023': df_oc_2023_sorted,
-            'df_2021': df_oc_2021_sorted
+            'df_oc': df_oc,
+            # Home-country rows per edition, oldest first
+            'home': df_oc[df_oc['Country'] == OC_HOME_COUNTRY].set_index('Tahun'),
         }
+    except StaleDataVersionError:
+        raise
     except Exception as e:
         st.error(f"Error loading OC Index data: {e}")
         return None
 
+# --- World Crime Rate Matrix ---
+
+WORLD_HOME_CODE = 'IDN'
+# ISO3 codes compared against Indonesia in the national overview (ASEAN, as in OC_PEER_GROUPS)
+WORLD_PEER_CODES = ['IDN', 'BRN', 'KHM', 'LAO', 'MYS', 'MMR', 'PHL', 'SGP', 'THA', 'TLS', 'VNM']
+
+def build_world_crime_matrix(df):
+    """Pack the wide World Crime Rate table into a float32 country x year matrix indexed by ISO3
+    
+    Missing values ('..') stay NaN. Returns {'iso3', 'names', 'years', 'values'} where row i of
+    values belongs to iso3[i] and column j to years[j].
+    """
+    df = df.dropna(subset=['Country Code']).drop_duplicates('Country Code')
+    year_columns = [col for col in df.columns if col.isdigit()]
+    return {
+        'iso3': pd.Index(df['Country Code'].astype(str), name='Country Code'),
+        'names': df['Country Name'].to_numpy(dtype=object),
+        'years': np.array([int(col) for col in year_columns], dtype=np.int16),
+        'values': df[year_columns].to_numpy(dtype=np.float32),
+    }
+
+@st.cache_data(max_entries=2)
+def load_world_crime_matrix(data_version=None):
+    """Load World Crime Rate.csv as an ISO3 x year matrix"""
+    df = read_dataset('world_crime_rate')
+    require_data_version(data_version)
+    return build_world_crime_matrix(df)
+
+def world_crime_rows(matrix, codes):
+    """Slice the matrix rows for ISO3 codes; unknown codes are skipped
+    
+    Returns the matching codes, their country names and a (len(codes), len(years)) array.
+    """
+    rows = matrix['iso3'].get_indexer(codes)
+    rows = rows[rows >= 0]
+    return matrix['iso3'][rows], matrix['names'][rows], matrix['values'][rows]
+
+def create_world_crime_comparison(matrix, codes=WORLD_PEER_CODES, home_code=WORLD_HOME_CODE):
+    """Create Indonesia-versus-peers line chart from the world crime rate matrix"""
+    if matrix is None:
+        return None
+    
+    found_codes, names, values = world_crime_rows(matrix, codes)
+    # Plot only countries and years that have at least one observation
+    has_country = ~np.isnan(values).all(axis=1)
+    has_year = ~np.isnan(values[has_country]).all(axis=0)
+    if not has_year.any():
+        return None
+    years = matrix['years'][has_year]
+    
+    fig = go.Figure()
+    for code, name, series in zip(found_codes[has_country], names[has_country], values[has_country][:, has_year]):
+        is_home = code == home_code
+        fig.add_trace(go.Scatter(
+            x=years,
+            y=series,
+            mode='lines+markers',
+            name=name,
+            connectgaps=False,
+            line=dict(color='#ff6b6b' if is_home else None, width=3 if is_home else 1.5),
+            marker=dict(size=8 if is_home else 5)
+        ))
+    
+    title = "Tingkat Kriminalitas Dunia: Indonesia dan ASEAN"
+    if home_code not in found_codes[has_country]:
+        title += " (data Indonesia tidak tersedia)"
+    
+    fig.update_layout(
+        title=title,
+        xaxis_title="Tahun",
+        yaxis_title="Tingkat Kriminalitas (per 100.000 Penduduk)",
+        plot_bgcolor='#25262d',
+        paper_bgcolor='#25262d',
+        font_color='white',
+        margin=dict(l=20, r=20, t=40, b=20),
+        height=400
+    )
+    
+    return fig
+
 def create_crime_trend_2012_2023(df_time_series, selected_province='All', selected_region='All'):
     """Create crime rate trend chart for 2012-2023 with filtering support"""
     if df_time_series is None or df_time_series.empty:
@@ -1423,65 +2057,33 @@ def create_crime_trend_2012_2023(df_time_series, selected_province='All', select
     if selected_province != 'Semua':
         # Show specific province trend
         title = f"Tren Tingkat Kriminalitas {selected_province} (2016-2023)"
-        df_to_analyze = df_time_series[df_time_series['Provinsi'] == selected_province]
+        df_to_analyze = df_time_series[df_time_series['province_id'] == province_id_for_name(selected_province)]
         line_name = selected_province
         line_color = '#ff6b6b'
     elif selected_region != 'Semua':
         # Show regional average trend
         title = f"Tren Tingkat Kriminalitas Wilayah {selected_region} (2016-2023)"
         # Filter time series data by region (need to add region mapping)
-        region_mapping = {
-            "ACEH": "Sumatra", "SUMATERA UTARA": "Sumatra", "SUMATERA BARAT": "Sumatra",
-            "RIAU": "Sumatra", "KEPULAUAN RIAU": "Sumatra", "JAMBI": "Sumatra",
-            "SUMATERA SELATAN": "Sumatra", "BENGKULU": "Sumatra", "LAMPUNG": "Sumatra",
-            "KEPULAUAN BANGKA BELITUNG": "Sumatra", "DKI JAKARTA": "Jawa", "JAWA BARAT": "Jawa",
-            "JAWA TENGAH": "Jawa", "DI YOGYAKARTA": "Jawa", "JAWA TIMUR": "Jawa", "BANTEN": "Jawa",
-            "KALIMANTAN BARAT": "Kalimantan", "KALIMANTAN TENGAH": "Kalimantan",
-            "KALIMANTAN SELATAN": "Kalimantan", "KALIMANTAN TIMUR": "Kalimantan",
-            "KALIMANTAN UTARA": "Kalimantan", "SULAWESI UTARA": "Sulawesi",
-            "SULAWESI TENGAH": "Sulawesi", "SULAWESI SELATAN": "Sulawesi",
-            "SULAWESI TENGGARA": "Sulawesi", "GORONTALO": "Sulawesi", "SULAWESI BARAT": "Sulawesi",
-            "BALI": "Bali & Nusa Tenggara", "NUSA TENGGARA BARAT": "Bali & Nusa Tenggara",
-            "NUSA TENGGARA TIMUR": "Bali & Nusa Tenggara", "MALUKU": "Maluku", "MALUKU UTARA": "Maluku",
-            "PAPUA": "Papua", "PAPUA BARAT": "Papua"
-        }
-        regional_provinces = [prov for prov, region in region_mapping.items() if region == selected_region]
-        df_to_analyze = df_time_series[df_time_series['Provinsi'].isin(regional_provinces)]
+        df_to_analyze = df_time_series[df_time_series['province_id'].isin(province_ids_for_region(selected_region))]
         line_name = f"{selected_region} Average"
         line_color = '#ff6b6b'
     else:
         # Show national average trend
         title = "Tren Tingkat Kriminalitas Indonesia (2016-2023)"
-        df_to_analyze = df_time_series[df_time_series['Provinsi'] != 'INDONESIA'] if 'INDONESIA' in df_time_series['Provinsi'].values else df_time_series
+        df_to_analyze = df_time_series[df_time_series['province_id'] != NATIONAL_PROVINCE[0]]
         line_name = 'National Average'
         line_color = '#ff6b6b'
     
-    # Calculate trend data
-    years = []
-    crime_rates = []
-    
-    year_columns = [col for col in df_time_series.columns if col.isdigit() and int(col) >= 2016 and int(col) <= 2023]
-    
-    for year_col in sorted(year_columns):
-        year = int(year_col)
-        
-        # Clean and convert the data to numeric, handling errors
-        try:
-            if selected_province != 'Semua' and not df_to_analyze.empty:
-                # For province, get specific value
-                numeric_data = pd.to_numeric(df_to_analyze[year_col], errors='coerce')
-                avg_crime = numeric_data.iloc[0] if len(numeric_data) > 0 else None
-            else:
-                # For region/national, calculate average
-                numeric_data = pd.to_numeric(df_to_analyze[year_col], errors='coerce')
-                avg_crime = numeric_data.mean()
-            
-            if not pd.isna(avg_crime):
-                years.append(year)
-                crime_rates.append(avg_crime)
-        except Exception as e:
-            print(f"Error processing year {year}: {e}")
-            continue
+    # Calculate trend data from the long Provinsi x Tahun table
+    df_years = df_to_analyze[df_to_analyze['Tahun'].between(2016, 2023)].dropna(subset=['Tindak Pidana'])
+    if selected_province != 'Semua':
+        # For province, get specific value
+        trend = df_years.groupby('Tahun')['Tindak Pidana'].first().sort_index()
+    else:
+        # For region/national, calculate average
+        trend = df_years.groupby('Tahun')['Tindak Pidana'].mean().sort_index()
+    years = trend.index.tolist()
+    crime_rates = trend.tolist()
     
     if len(years) > 0 and len(crime_rates) > 0:
         fig = go.Figure()
@@ -1566,20 +2168,19 @@ def create_scatter_plot(df_filtered, x_col, y_col, title):
     
     return fig
 
-def render_provincial_metrics(df_filtered, selected_province, selected_region, df_main):
-    """Render metrics for provincial/regional data instead of OC Index"""
+def render_provincial_metrics(aggregate, selected_province, selected_region):
+    """Render metrics for provincial/regional data instead of OC Index, from the filter state's
+    aggregate cube entry"""
     
     if selected_province != 'Semua':
         # Provincial view - show specific province data
-        province_data = df_filtered[df_filtered['Provinsi'] == selected_province].iloc[0] if not df_filtered.empty else None
-        
-        if province_data is not None and 'Tindak Pidana 2023' in province_data and 'Tindak Pidana 2022' in province_data:
+        if aggregate['count']:
             # Create columns for horizontal layout of metrics
             col1, col2, col3 = st.columns(3)
             
             # Crime Rate 2023 vs 2022
-            crime_2023 = province_data['Tindak Pidana 2023']
-            crime_2022 = province_data['Tindak Pidana 2022']
+            crime_2023 = aggregate['current']
+            crime_2022 = aggregate['previous']
             
             with col1:
                 if pd.notna(crime_2023) and pd.notna(crime_2022):
@@ -1607,47 +2208,35 @@ def render_provincial_metrics(df_filtered, selected_province, selected_region, d
                         help="Insiden kejahatan per 100.000 penduduk"
                     )
             
+            province_ranks = aggregate['ranks']
+            
             # Regional ranking (rank within region)
             with col2:
-                if 'Region' in province_data and pd.notna(province_data['Region']):
-                    region_provinces = df_main[df_main['Region'] == province_data['Region']]
-                    if 'Tindak Pidana 2023' in region_provinces.columns:
-                        region_sorted = region_provinces.dropna(subset=['Tindak Pidana 2023']).sort_values('Tindak Pidana 2023', ascending=True).reset_index(drop=True)
-                        regional_rank = region_sorted[region_sorted['Provinsi'] == selected_province].index[0] + 1 if selected_province in region_sorted['Provinsi'].values else None
-                        total_in_region = len(region_sorted)
-                        
-                        if regional_rank:
-                            st.metric(
-                                f"Peringkat di {province_data['Region']}",
-                                f"#{regional_rank} / {total_in_region}",
-                                help="Peringkat wilayah berdasarkan tingkat kriminalitas (Peringkat rendah lebih baik)"
-                            )
+                if province_ranks is not None and pd.notna(aggregate['region']):
+                    st.metric(
+                        f"Peringkat di {aggregate['region']}",
+                        f"#{int(province_ranks['region_rank'])} / {int(province_ranks['region_total'])}",
+                        help="Peringkat wilayah berdasarkan tingkat kriminalitas (Peringkat rendah lebih baik)"
+                    )
             
             # National ranking (rank among all provinces)
             with col3:
-                if 'Tindak Pidana 2023' in df_main.columns:
-                    national_sorted = df_main.dropna(subset=['Tindak Pidana 2023']).sort_values('Tindak Pidana 2023', ascending=True).reset_index(drop=True)
-                    national_rank = national_sorted[national_sorted['Provinsi'] == selected_province].index[0] + 1 if selected_province in national_sorted['Provinsi'].values else None
-                    total_provinces = len(national_sorted)
-                    
-                    if national_rank:
-                        st.metric(
-                            "Peringkat Nasional",
-                            f"#{national_rank} / {total_provinces}",
-                            help="Peringkat nasional berdasarkan tingkat kriminalitas (Peringkat rendah lebih baik)"
-                        )
+                if province_ranks is not None:
+                    st.metric(
+                        "Peringkat Nasional",
+                        f"#{int(province_ranks['national_rank'])} / {int(province_ranks['national_total'])}",
+                        help="Peringkat nasional berdasarkan tingkat kriminalitas (Peringkat rendah lebih baik)"
+                    )
                     
     elif selected_region != 'All':
         # Regional view - show regional average
-        regional_data = df_filtered
-        
-        if not regional_data.empty and 'Tindak Pidana 2023' in regional_data.columns:
+        if aggregate['count']:
             # Create columns for horizontal layout of regional metrics
             col1, col2, col3 = st.columns(3)
             
             # Regional average crime rate
-            avg_crime_2023 = regional_data['Tindak Pidana 2023'].mean()
-            avg_crime_2022 = regional_data['Tindak Pidana 2022'].mean() if 'Tindak Pidana 2022' in regional_data.columns else None
+            avg_crime_2023 = aggregate['current']
+            avg_crime_2022 = aggregate['previous']
             
             with col1:
                 if pd.notna(avg_crime_2023) and pd.notna(avg_crime_2022):
@@ -1677,81 +2266,517 @@ def render_provincial_metrics(df_filtered, selected_province, selected_region, d
             
             # Regional rank among all regions
             with col2:
-                region_averages = df_main.groupby('Region')['Tindak Pidana 2023'].mean().dropna().sort_values(ascending=True)
-                regional_rank = list(region_averages.index).index(selected_region) + 1 if selected_region in region_averages.index else None
-                total_regions = len(region_averages)
-                
-                if regional_rank:
+                region_ranks = aggregate['ranks']
+                if region_ranks is not None:
                     st.metric(
                         "Peringkat Wilayah",
-                        f"#{regional_rank} / {total_regions}",
+                        f"#{int(region_ranks['rank'])} / {int(region_ranks['total'])}",
                         help="Peringkat wilayah berdasarkan rata-rata tingkat kriminalitas (Peringkat rendah lebih baik)"
                     )
             
             # Number of provinces in region
             with col3:
-                num_provinces = len(regional_data)
+                num_provinces = aggregate['count']
                 st.metric(
                     "# Provinsi dalam Wilayah",
                     f"{num_provinces} Provinsi",
                     help="Jumlah provinsi di wilayah ini"
                 )
 
+# --- Panel Data ---
+
+# Datasets that are not province-level tables, each with its own cached loader
+SHARED_DATASETS = {
+    'crime_time_series': load_crime_time_series,
+    'oc_index': load_oc_index_data,
+    'world_crime_rate': load_world_crime_matrix,
+    'geojson': load_map_geometry,
+    'aggregates': load_aggregate_cube,
+}
+
+# Datasets each panel reads. Nothing is loaded until a panel asks for it, so the national
+# overview renders without the socioeconomic joins further down the page.
+PANEL_DEPENDENCIES = {
+    'key_metrics': ['crime', 'oc_index', 'aggregates'],
+    'crime_trend': ['crime_time_series'],
+    'top_provinces': ['aggregates'],
+    'world_comparison': ['world_crime_rate'],
+    'crime_map': ['crime', 'geojson'],
+    'socioeconomic': ['crime', 'gini', 'education', 'geojson'],
+    'data_table': ['income', 'education', 'crime', 'gini', 'population'],
+}
+
+# Panels at the top of the page, prefetched concurrently on startup
+OVERVIEW_PANELS = ['key_metrics', 'crime_trend', 'top_provinces', 'world_comparison', 'crime_map']
+
+def panel_province_datasets(panel):
+    """The province-level datasets a panel depends on, as a hashable cache key"""
+    return tuple(name for name in PANEL_DEPENDENCIES[panel] if name in PROVINCE_DATASETS)
+
+def load_panel_data(panel, data_version=None):
+    """Load a panel's declared datasets: province-level ones joined under 'provinces', the rest by name"""
+    data = {
+        name: SHARED_DATASETS[name](data_version) for name in PANEL_DEPENDENCIES[panel] if name in SHARED_DATASETS
+    }
+    province_datasets = panel_province_datasets(panel)
+    if province_datasets:
+        data['provinces'] = load_province_frame(province_datasets, data_version)
+    return data
+
+# --- Choropleth Spec Cache ---
+
+# Panel whose province frame holds each choropleth metric
+CHOROPLETH_PANELS = {
+    'Crime Rate 2023': 'crime_map',
+    'Gini Ratio': 'socioeconomic',
+    'Education': 'socioeconomic',
+    'Population': 'data_table',
+    'Income': 'data_table',
+}
+# Maps drawn on the page, whose specs can be built for every filter state ahead of use
+DASHBOARD_CHOROPLETHS = ['Crime Rate 2023', 'Gini Ratio', 'Education']
+# When those specs are built on the watcher thread: 'swap' builds them for each new data version
+# before it goes live, 'startup' also builds them for the version the server starts with, and
+# False leaves every spec to be built on first use
+CHOROPLETH_WARMUP = 'swap'
+CHOROPLETH_WARMUP_WORKERS = 4
+# Room for every metric x filter state of a data version; least recently used specs go first
+CHOROPLETH_CACHE_ENTRIES = 512
+
+def choropleth_filter_states():
+    """Every (region, province) pair the sidebar filters can produce"""
+    dim = build_province_dimension()
+    dim = dim[dim.index != NATIONAL_PROVINCE[0]]
+    states = [('Semua', 'Semua')]
+    states += [(region, 'Semua') for region in sorted(dim['Region'].dropna().unique())]
+    for row in dim.itertuples():
+        states += [('Semua', row.Provinsi), (row.Region, row.Provinsi)]
+    return states
+
+@st.cache_data(max_entries=CHOROPLETH_CACHE_ENTRIES)
+def load_choropleth_spec(metric, region_filter='Semua', province_filter='Semua', data_version=None, scheme='linear'):
+    """Choropleth spec for one metric, filter state and classification scheme; built once per
+    data version and shared by every session that selects it"""
+    provinces = load_panel_data(CHOROPLETH_PANELS[metric], data_version)['provinces']
+    return choropleth_spec(
+        filter_provinces(provinces, region_filter, province_filter), metric, load_map_geometry(data_version),
+        region_filter=region_filter, province_filter=province_filter, scheme=scheme
+    )
+
+def warm_choropleth_specs(data_version, metrics=DASHBOARD_CHOROPLETHS, script_ctx=None):
+    """Build the spec of every metric and filter state on a worker pool"""
+    return read_sources_concurrently({
+        (metric, region, province): partial(load_choropleth_spec, metric, region, province, data_version)
+        for metric in metrics
+        for region, province in choropleth_filter_states()
+    }, max_workers=CHOROPLETH_WARMUP_WORKERS, script_ctx=script_ctx, report=False)  # one entry per spec, too many to log
+
+# --- Static Map Images ---
+
+# Map images for clients that should do no Leaflet work (embeds, printouts, slow devices)
+STATIC_MAP_WIDTH_INCHES = 10
+STATIC_MAP_DPI = 100
+
+@st.cache_resource(max_entries=2)
+def load_geometry_frames(data_version=None):
+    """Province geometry as one GeoDataFrame per level in GEOMETRY_LEVELS, for static rendering"""
+    geometry = load_province_geometry(data_version)
+    return {
+        level: geometry.set_geometry(simplify_province_geometries(geometry.geometry.values, spec['tolerance']))
+        for level, spec in GEOMETRY_LEVELS.items()
+    }
+
+def draw_choropleth_figure(spec, frame):
+    """Draw a choropleth spec on a matplotlib Figure: same colours, view and legend as the live map"""
+    (min_lat, min_lng), (max_lat, max_lng) = spec['view']['bounds']
+    height = min(max(STATIC_MAP_WIDTH_INCHES * (max_lat - min_lat) / (max_lng - min_lng), 3), 8)
+    fig = Figure(figsize=(STATIC_MAP_WIDTH_INCHES, height), dpi=STATIC_MAP_DPI, facecolor='#25262d')
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_facecolor('#25262d')
+    ax.set_axis_off()
+
+    hidden = {'fillColor': '#00000000', 'fillOpacity': 0, 'color': '#00000000', 'weight': 0}
+    styles = [spec['attributes'].get(province_id, {'style': hidden})['style'] for province_id in frame['province_id']]
+    frame.plot(
+        ax=ax,
+        color=[mcolors.to_rgba(style['fillColor'][:7], style['fillOpacity']) for style in styles],
+        edgecolor=[mcolors.to_rgba(style['color'][:7], 1.0 if style['weight'] else 0.0) for style in styles],
+        # Leaflet weights are screen pixels, matplotlib widths are points
+        linewidth=[style['weight'] * 0.5 for style in styles],
+    )
+    ax.set_xlim(min_lng, max_lng)
+    ax.set_ylim(min_lat, max_lat)
+
+    legend = spec['legend']
+    if legend is not None:
+        if legend['breaks'] is None:
+            colormap = mcolors.LinearSegmentedColormap.from_list('legend', [color[:7] for color in legend['colors']])
+            norm = mcolors.Normalize(vmin=legend['vmin'], vmax=legend['vmax'])
+        else:
+            # One equal band per class with the breaks as ticks, as the live map's legend draws it
+            colormap = mcolors.ListedColormap(legend['colors'])
+            norm = mcolors.BoundaryNorm(np.arange(len(legend['breaks'])), len(legend['colors']))
+        mappable = ScalarMappable(norm=norm, cmap=colormap)
+        cax = ax.inset_axes([0.62, 0.9, 0.35, 0.03])
+        colorbar = fig.colorbar(mappable, cax=cax, orientation='horizontal')
+        if legend['breaks'] is not None:
+            colorbar.set_ticks(np.arange(len(legend['breaks'])), labels=[f"{value:,.2f}" for value in legend['breaks']])
+        colorbar.set_label(legend['caption'], color='white', fontsize=8)
+        colorbar.ax.tick_params(colors='white', labelsize=7)
+        colorbar.outline.set_visible(False)
+    return fig
+
+@st.cache_data(max_entries=CHOROPLETH_CACHE_ENTRIES)
+def render_choropleth_image(metric, region_filter='Semua', province_filter='Semua', data_version=None,
+                            image_format='png', scheme='linear'):
+    """A choropleth as PNG or SVG bytes, rendered once per metric, filter state, scheme and data version"""
+    spec = load_choropleth_spec(metric, region_filter, province_filter, data_version, scheme)
+    fig = draw_choropleth_figure(spec, load_geometry_frames(data_version)[spec['level']])
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=image_format, facecolor=fig.get_facecolor())
+    return buffer.getvalue()
+
+def show_choropleth(metric, region_filter, province_filter, data_version, map_geometry, height, key, static=False,
+                    scheme='linear'):
+    """Draw a page map: the interactive map component, or a cached image in static mode"""
+    if static:
+        st.image(
+            render_choropleth_image(metric, region_filter, province_filter, data_version, scheme=scheme),
+            use_container_width=True,
+        )
+        st.download_button(
+            "Unduh peta (SVG)",
+            render_choropleth_image(metric, region_filter, province_filter, data_version, 'svg', scheme),
+            file_name=f"{key}.svg",
+            mime="image/svg+xml",
+            key=f"{key}_download",
+        )
+    else:
+        spec = load_choropleth_spec(metric, region_filter, province_filter, data_version, scheme)
+        render_choropleth_map(spec, map_geometry, height=height, key=key)
+
+# --- Source Change Watcher ---
+
+# Every file feeding the cached loaders; a change to any of them publishes a new data version
+WATCHED_SOURCE_GLOBS = [os.path.join(DATASET_DIR, "*.csv"), os.path.join("map", "*.geojson")]
+WATCH_INTERVAL_SECONDS = 30
+
+def source_fingerprint(patterns=WATCHED_SOURCE_GLOBS):
+    """Cheap change check: (path, size, mtime) of every watched file"""
+    entries = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(entries)
+
+def compute_data_version(patterns=WATCHED_SOURCE_GLOBS):
+    """Content hash over every watched file (path + bytes); keys the cached loaders"""
+    hasher = hashlib.sha256(f"v{SNAPSHOT_VERSION}".encode("utf-8"))
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            hasher.update(path.encode("utf-8"))
+            update_file_hash(hasher, path)
+    return hasher.hexdigest()[:16]
+
+class StaleDataVersionError(RuntimeError):
+    """The sources on disk are no longer the ones a data version was computed from"""
+
+# How many published data versions keep their source fingerprint
+DATA_VERSION_HISTORY = 8
+
+@st.cache_resource
+def data_version_fingerprints():
+    """Source fingerprint of each published data version, newest last; one per server process,
+    since module globals are re-created on every script rerun"""
+    return {}
+
+def record_data_version(data_version, fingerprint):
+    """Remember which files a published data version was computed from"""
+    fingerprints = data_version_fingerprints()
+    fingerprints.pop(data_version, None)
+    fingerprints[data_version] = fingerprint
+    while len(fingerprints) > DATA_VERSION_HISTORY:
+        fingerprints.pop(next(iter(fingerprints)))
+
+def require_data_version(data_version):
+    """Raise StaleDataVersionError when a loader has just read sources that no longer match the
+    data version it was asked for, so newer files are never cached under an older version's key
+    
+    Loaders call this after reading and before caching or snapshotting. Versions that were never
+    published (build steps, data_version=None) are not checked.
+    """
+    expected = data_version_fingerprints().get(data_version)
+    if expected is not None and source_fingerprint() != expected:
+        raise StaleDataVersionError(f"Sources changed since data version {data_version}")
+
+def warm_data_version(data_version, script_ctx=None):
+    """Load every panel's data for a data version so its cache entries exist before it goes live"""
+    results = read_sources_concurrently({
+        panel: partial(load_panel_data, panel, data_version) for panel in PANEL_DEPENDENCIES
+    }, script_ctx=script_ctx)
+    load_rank_tables(data_version)
+    if CHOROPLETH_WARMUP:
+        warm_choropleth_specs(data_version, script_ctx=script_ctx)
+    return results
+
+class SourceWatcher:
+    """Polls the source files and publishes a new data version once it is fully built
+    
+    Sessions read current_version once per rerun and pass it to the cached loaders, so a rerun
+    already in flight keeps the version it started with. Rebuilds only ever run on the watcher
+    thread, so a new release costs one rebuild rather than one per session.
+    """
+    
+    def __init__(self, interval=WATCH_INTERVAL_SECONDS):
+        self.interval = interval
+        self.fingerprint = source_fingerprint()
+        self.current_version = compute_data_version()
+        record_data_version(self.current_version, self.fingerprint)
+        self._pending_fingerprint = self.fingerprint
+        # Polls and on-demand refreshes from sessions never rebuild at the same time
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="source-watcher", daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        if CHOROPLETH_WARMUP == 'startup':
+            try:
+                warm_choropleth_specs(self.current_version)
+            except Exception as e:
+                # Specs that were not warmed are built on first use
+                print(f"Could not warm choropleth maps: {e}")
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                # Keep serving the last good version; the next poll retries the rebuild
+                print(f"Source watcher could not rebuild data: {e}")
+    
+    def check_for_changes(self):
+        """Rebuild and swap in a new data version if the sources changed; True when swapped"""
+        fingerprint = source_fingerprint()
+        if fingerprint == self.fingerprint:
+            return False
+        if fingerprint != self._pending_fingerprint:
+            # Wait one more poll so a release that is still being copied in has settled
+            self._pending_fingerprint = fingerprint
+            return False
+        return self.refresh()
+    
+    def refresh(self):
+        """Publish the data version of the sources on disk now, rebuilding it first if it is new;
+        True when swapped. Sessions call this when their pinned version's sources are gone."""
+        with self._lock:
+            fingerprint = source_fingerprint()
+            data_version = compute_data_version()
+            swapped = data_version != self.current_version
+            if swapped:
+                start = time.perf_counter()
+                record_data_version(data_version, fingerprint)
+                warm_data_version(data_version)
+                # Single reference assignment: a rerun sees either the old version or the new one
+                self.current_version = data_version
+                print(f"Data version {data_version} live after {time.perf_counter() - start:.1f}s rebuild")
+            else:
+                # Same content under new mtimes (a touch, or a release rolled back)
+                record_data_version(data_version, fingerprint)
+            self.fingerprint = self._pending_fingerprint = fingerprint
+            return swapped
+
+@st.cache_resource
+def get_source_watcher():
+    """One watcher per server process, shared by every session"""
+    return SourceWatcher()
+
+def load_startup_data(data_version=None, panels=OVERVIEW_PANELS):
+    """Load the given panels' data concurrently (cache hits return immediately)"""
+    # Runs on every rerun; the loaders below it log their own timings when they actually read
+    return read_sources_concurrently({
+        panel: partial(load_panel_data, panel, data_version) for panel in panels
+    }, script_ctx=get_script_run_ctx(), report=False)
+
+# --- Figure Cache ---
+
+# Built Plotly figures, one per chart, argument set and data version; least recently used
+# figures go first
+FIGURE_CACHE_ENTRIES = 256
+PLOTLY_CONFIG = {'displayModeBar': False}
+
+def crime_trend_figure(data_version, region, province):
+    crime_trend = load_panel_data('crime_trend', data_version)
+    return create_crime_trend_2012_2023(crime_trend['crime_time_series'], province, region)
+
+def top_provinces_figure(data_version, region, province):
+    top_provinces = load_panel_data('top_provinces', data_version)
+    return create_top_provinces_chart(aggregate_for(top_provinces['aggregates'], region, province)['top'])
+
+def world_comparison_figure(data_version):
+    return create_world_crime_comparison(load_panel_data('world_comparison', data_version)['world_crime_rate'])
+
+def scatter_figure(data_version, region, province, x_col, title, y_col='Tindak Pidana 2023'):
+    df_filtered = filter_provinces(load_panel_data('socioeconomic', data_version)['provinces'], region, province)
+    if x_col not in df_filtered.columns or y_col not in df_filtered.columns:
+        return None
+    return create_scatter_plot(df_filtered, x_col, y_col, title)
+
+# Chart name -> builder taking (data_version, *args) and returning a figure or None
+FIGURE_BUILDERS = {
+    'crime_trend': crime_trend_figure,
+    'top_provinces': top_provinces_figure,
+    'world_comparison': world_comparison_figure,
+    'scatter': scatter_figure,
+}
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def load_figure(chart, data_version, *args):
+    """A chart's Plotly figure, built once per argument set and data version and shared by every
+    session; None when the chart has no data. Treat it as read-only."""
+    return FIGURE_BUILDERS[chart](data_version, *args)
+
+def show_figure(chart, data_version, *args):
+    """Draw a cached chart; returns False when there was nothing to draw"""
+    fig = load_figure(chart, data_version, *args)
+    if fig is None:
+        return False
+    # A built figure is passed as-is: st.plotly_chart neither validates nor modifies it, only
+    # encodes it for the browser
+    st.plotly_chart(fig, use_container_width=True, config=PLOTLY_CONFIG)
+    return True
+
+# --- Page Panels ---
+
+def reload_on_stale_version(render):
+    """Rerun the page on the live data version when the sources of the version a rerun was
+    pinned to are gone (its cache entries were evicted after the files changed)"""
+    @wraps(render)
+    def wrapper(*args, **kwargs):
+        try:
+            return render(*args, **kwargs)
+        except StaleDataVersionError:
+            with st.spinner("Memperbarui data..."):
+                get_source_watcher().refresh()
+            st.rerun()
+    return wrapper
+
+# Every panel is a fragment that takes the filter state it depends on as arguments and loads its
+# own (cached) data. A widget inside a panel reruns and re-sends only that panel; a sidebar
+# filter change reruns the page.
+
+@st.fragment
+@reload_on_stale_version
+def key_metrics_panel(data_version, region, province):
+    """Metric cards; depends on region and province"""
+    key_metrics = load_panel_data('key_metrics', data_version)
+    render_key_metrics(aggregate_for(key_metrics['aggregates'], region, province), province, key_metrics['oc_index'], region)
+
+@st.fragment
+@reload_on_stale_version
+def crime_trend_panel(data_version, region, province):
+    """Crime trend 2012-2023; depends on region and province"""
+    if not show_figure('crime_trend', data_version, region, province):
+        st.info("Data runtun waktu tidak tersedia")
+
+@st.fragment
+@reload_on_stale_version
+def top_provinces_panel(data_version, region, province):
+    """Top provinces by crime rate; depends on region and province"""
+    if not show_figure('top_provinces', data_version, region, province):
+        st.info("Data kriminalitas tidak tersedia")
+
+@st.fragment
+@reload_on_stale_version
+def world_comparison_panel(data_version):
+    """Indonesia against its peers in the world crime rate series; depends on no filter"""
+    show_figure('world_comparison', data_version)
+
+@st.fragment
+@reload_on_stale_version
+def choropleth_panel(metric, data_version, region, province, height, key):
+    """One choropleth with its own display controls; depends on region and province, and
+    changing the controls redraws only this map"""
+    with st.popover("Tampilan peta"):
+        # Static maps: plain images instead of interactive maps, for slow devices and printouts
+        static = st.checkbox(
+            "Peta statis (gambar)", key=f"{key}_static", help="Tampilkan peta sebagai gambar tanpa interaksi"
+        )
+        scheme = st.selectbox(
+            "Klasifikasi warna", list(CLASSIFICATION_SCHEMES), format_func=CLASSIFICATION_SCHEMES.get,
+            key=f"{key}_scheme",
+        )
+    map_geometry = load_panel_data(CHOROPLETH_PANELS[metric], data_version)['geojson']
+    if map_geometry:
+        show_choropleth(
+            metric, region, province, data_version, map_geometry,
+            height=height, key=key, static=static, scheme=scheme
+        )
+    else:
+        st.warning("GeoJSON or province mapping not loaded.")
+
+@st.fragment
+@reload_on_stale_version
+def scatter_panel(data_version, region, province, x_col, title):
+    """A socioeconomic indicator against the crime rate; depends on region and province"""
+    show_figure('scatter', data_version, region, province, x_col, title)
+
+@st.fragment
+@reload_on_stale_version
+def data_table_panel(data_version, region, province):
+    """Province table; depends on region and province"""
+    data_table = load_panel_data('data_table', data_version)
+    render_provincial_data_table(filter_provinces(data_table['provinces'], region, province))
+
+@reload_on_stale_version
 def main():
     st.title("🇮🇩 Dashboard Kriminalitas Indonesia")
     # st.markdown("### Interactive Analysis of Provincial Crime Data")
     
     # Load data
     with st.spinner("Memuat dan memproses data..."):
-        df_main, df_time_series = load_and_process_data()
-        oc_data = load_oc_index_data()
+        # Pin this rerun to the live data version; a background swap only affects later reruns
+        data_version = get_source_watcher().current_version
+        # Only the panels at the top of the page; the rest load when they are reached
+        panel_data = load_startup_data(data_version)
     
-    if df_main is None or df_main.empty:
+    if panel_data['key_metrics']['provinces'].empty:
         st.error("Gagal memuat data. Silakan periksa file dataset Anda.")
         return
     
-    # Exclude 'INDONESIA' from all dataframes at the start of main analysis
-    if 'Provinsi' in df_main.columns:
-        df_main = df_main[df_main['Provinsi'] != 'INDONESIA']
-    
     # Sidebar for filters and controls
     st.sidebar.header("Kriminalitas Indonesia")
     
-    # Initialize filter variables
-    selected_region = 'All'
-    selected_province = 'All'
+    # Filter choices come from the province dimension, without the national row
+    dimension = build_province_dimension()
+    dimension = dimension[dimension.index != NATIONAL_PROVINCE[0]]
     
     # Region filter
-    if 'Region' in df_main.columns:
-        regions = ['Semua'] + sorted(df_main['Region'].dropna().unique().tolist())
-        selected_region = st.sidebar.selectbox("Pilih Wilayah:", regions)
-        if selected_region != 'Semua':
-            df_filtered = df_main[df_main['Region'] == selected_region]
-        else:
-            df_filtered = df_main
-    else:
-        df_filtered = df_main
+    regions = ['Semua'] + sorted(dimension['Region'].dropna().unique().tolist())
+    selected_region = st.sidebar.selectbox("Pilih Wilayah:", regions)
+    if selected_region != 'Semua':
+        dimension = dimension[dimension['Region'] == selected_region]
     
     # Province filter
-    if 'Provinsi' in df_filtered.columns:
-        available_provinces = df_filtered['Provinsi'].dropna().unique().tolist()
-        provinces = ['Semua'] + sorted(available_provinces)
-        selected_province = st.sidebar.selectbox("Pilih Provinsi:", provinces)
-        if selected_province != 'Semua':
-            df_filtered = df_filtered[df_filtered['Provinsi'] == selected_province]
+    provinces = ['Semua'] + sorted(dimension['Provinsi'].dropna().unique().tolist())
+    selected_province = st.sidebar.selectbox("Pilih Provinsi:", provinces)
+    if selected_province != 'Semua':
+        dimension = dimension[dimension['Provinsi'] == selected_province]
     
     # Display active filters
     st.sidebar.markdown("---")
     st.sidebar.subheader("Filter Aktif")
-    if 'Region' in df_main.columns and selected_region != 'Semua':
+    if selected_region != 'Semua':
         st.sidebar.write(f"🌍 **Wilayah:** {selected_region}")
-    if 'Provinsi' in df_main.columns and selected_province != 'Semua':
+    if selected_province != 'Semua':
         st.sidebar.write(f"📍 **Provinsi:** {selected_province}")
     if (selected_region == 'Semua' and selected_province == 'Semua'):
         st.sidebar.write("🌐 Menampilkan semua data")
     
     # Show number of provinces in current selection
-    num_provinces = len(df_filtered['Provinsi'].unique()) if 'Provinsi' in df_filtered.columns else 0
+    num_provinces = len(dimension)
     st.sidebar.write(f"📊 **Provinsi ditampilkan:** {num_provinces}")
     
     # Dynamic header based on selection
@@ -1763,38 +2788,23 @@ def main():
         st.markdown("## Tinjauan Nasional")
     
     # First row: Key metrics
-    render_key_metrics(df_filtered, selected_province, oc_data, selected_region, df_main)
+    key_metrics_panel(data_version, selected_region, selected_province)
     
     trend_col, top_col = st.columns([3, 2])
     
     with trend_col:
-        trend_fig = create_crime_trend_2012_2023(df_time_series, selected_province, selected_region)
-        if trend_fig:
-            st.plotly_chart(trend_fig, use_container_width=True, config={'displayModeBar': False})
-        else:
-            st.info("Data runtun waktu tidak tersedia")
+        crime_trend_panel(data_version, selected_region, selected_province)
     
     with top_col:
-        top_fig = create_top_provinces_chart(df_filtered)
-        if top_fig:
-            st.plotly_chart(top_fig, use_container_width=True, config={'displayModeBar': False})
-        else:
-            st.info("Data kriminalitas tidak tersedia")
+        top_provinces_panel(data_version, selected_region, selected_province)
+    
+    # National overview: Indonesia against its peers in the world crime rate series
+    if selected_region == 'Semua' and selected_province == 'Semua':
+        world_comparison_panel(data_version)
     
     # Third row: Crime choropleth map
-    geojson_data = load_geojson()
-    province_mapping = create_province_mapping()
-    
-    if geojson_data and province_mapping:
-        with st.spinner("Membuat peta kriminalitas choropleth..."):
-            folium_map = create_choropleth_map(
-                df_filtered, 'Crime Rate 2023', geojson_data, province_mapping,
-                region_filter=selected_region, province_filter=selected_province
-            )
-        st_folium(folium_map, width="100%", height=350, returned_objects=[], key="crime_map")
-        # st.info("🔍 **Map Interpretation**: Darker red areas indicate higher crime rates per 100,000 population.")
-    else:
-        st.warning("GeoJSON or province mapping not loaded.")
+    choropleth_panel('Crime Rate 2023', data_version, selected_region, selected_province, height=350, key="crime_map")
+    # st.info("🔍 **Map Interpretation**: Darker red areas indicate higher crime rates per 100,000 population.")
     
     # Second row: Detailed analysis
     st.markdown("---")
@@ -1805,53 +2815,30 @@ def main():
     
     with gini_col:
         st.subheader("Analisis Ketimpangan Pendapatan")
-        
-        # Gini ratio choropleth
-        if geojson_data and province_mapping:
-            with st.spinner("Membuat peta choropleth rasio Gini..."):
-                gini_map = create_choropleth_map(
-                    df_filtered, 'Gini Ratio', geojson_data, province_mapping,
-                    region_filter=selected_region, province_filter=selected_province
-                )
-            st_folium(gini_map, width="100%", height=400, returned_objects=[], key="gini_map")
-        
-        # Gini vs Crime scatter plot
-        if 'gini_ratio_2023' in df_filtered.columns and 'Tindak Pidana 2023' in df_filtered.columns:
-            gini_scatter = create_scatter_plot(
-                df_filtered,
-                'gini_ratio_2023', 
-                'Tindak Pidana 2023',
-                "Ketimpangan Pendapatan vs Tingkat Kriminalitas"
-            )
-            if gini_scatter:
-                st.plotly_chart(gini_scatter, use_container_width=True, config={'displayModeBar': False})
+        choropleth_panel('Gini Ratio', data_version, selected_region, selected_province, height=400, key="gini_map")
+        scatter_panel(
+            data_version, selected_region, selected_province,
+            'gini_ratio_2023', "Ketimpangan Pendapatan vs Tingkat Kriminalitas"
+        )
     
     with education_col:
         st.subheader("Analisis Pendidikan")
-        
-        # Education choropleth (using SMA/PT completion rate)
-        if geojson_data and province_mapping and 'Pendidikan Terakhir SMA/PT' in df_filtered.columns:
-            with st.spinner("Membuat peta choropleth pendidikan..."):
-                edu_map = create_choropleth_map(
-                    df_filtered, 'Education', geojson_data, province_mapping,
-                    region_filter=selected_region, province_filter=selected_province
-                )
-            st_folium(edu_map, width="100%", height=400, returned_objects=[], key="education_map")
-        
-        # Education vs Crime scatter plot
-        if 'Pendidikan Terakhir SMA/PT' in df_filtered.columns and 'Tindak Pidana 2023' in df_filtered.columns:
-            edu_scatter = create_scatter_plot(
-                df_filtered,
-                'Pendidikan Terakhir SMA/PT',
-                'Tindak Pidana 2023',
-                "Tingkat Pendidikan vs Tingkat Kriminalitas"
-            )
-            if edu_scatter:
-                st.plotly_chart(edu_scatter, use_container_width=True, config={'displayModeBar': False})
+        choropleth_panel('Education', data_version, selected_region, selected_province, height=400, key="education_map")
+        scatter_panel(
+            data_version, selected_region, selected_province,
+            'Pendidikan Terakhir SMA/PT', "Tingkat Pendidikan vs Tingkat Kriminalitas"
+        )
     
     # Data table at the bottom
     st.markdown("---")
-    render_provincial_data_table(df_filtered)
+    data_table_panel(data_version, selected_region, selected_province)
 
 if __name__ == "__main__":
-    main()
+    if "--build-snapshot" in sys.argv:
+        print(f"Snapshot written for sources {build_snapshot()[:12]}")
+    elif "--vendor-assets" in sys.argv:
+        print(f"Map component assets fetched: {', '.join(vendor_map_assets()) or 'none, all vendored'}")
+    elif "--build-tiles" in sys.argv:
+        print(f"Vector tiles written to {os.path.join(MAP_COMPONENT_DIR, build_vector_tiles())}")
+    else:
+        main()
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Behaviour tests for the dashboard's data processing, run with pytest
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+import shapely.geometry
+
+import dashboard
+
+COLORS = ('#ffffff', '#ff0000')
+
+def test_jenks_breaks_keep_repeated_values_apart():
+    """Every distinct value of a repeated series gets its own class"""
+    values = np.array([1, 1, 1, 5, 5, 5, 9, 9, 9, 20], dtype=float)
+    breaks = dashboard.classify_values(values, 'jenks')
+    assert breaks.tolist() == [1, 5, 9, 20, 20]
+    colors = dashboard.value_colors(values, COLORS, 1, 20, breaks)
+    assert len(set(colors[[0, 3, 6, 9]])) == 4
+
+def test_jenks_breaks_split_clusters():
+    values = np.array([30, 1, 12, 2, 10, 3, 11], dtype=float)
+    assert dashboard.jenks_breaks(values, 3).tolist() == [1, 10, 30, 30]
+
+def test_value_on_a_break_starts_the_class_above():
+    """Classes are half-open, [break, next break), like the legend's bands; the last is closed"""
+    breaks = np.array([0, 10, 20], dtype=float)
+    colors = dashboard.value_colors(np.array([0, 9.9, 10, 20], dtype=float), COLORS, 0, 20, breaks)
+    low, high = dashboard.class_colors(COLORS, breaks)
+    assert colors.tolist() == [low, low, high, high]
+
+def test_classify_values_schemes():
+    values = np.array([1, 2, 3, 4, np.nan], dtype=float)
+    assert dashboard.classify_values(values, 'linear') is None
+    assert dashboard.classify_values(values, 'equal_interval', classes=3).tolist() == [1, 2, 3, 4]
+    # A constant series is a single class
+    assert dashboard.classify_values(np.array([3.0, 3.0]), 'quantile').tolist() == [3, 3]
+
+def province_frame():
+    """Four provinces in two regions plus the national row, with a tie on the crime rate"""
+    return pd.DataFrame({
+        'province_id': [0, 1, 2, 3, 4],
+        'Provinsi': ['INDONESIA', 'P1', 'P2', 'P3', 'P4'],
+        'Region': [None, 'A', 'A', 'B', 'B'],
+        'Tindak Pidana 2023': [100.0, 10.0, 30.0, 30.0, 5.0],
+        'Tindak Pidana 2022': [90.0, 20.0, 20.0, 40.0, 10.0],
+        'SMA_2023': [50.0, 60.0, 70.0, 80.0, np.nan],
+    })
+
+def test_rank_tables_ties_and_direction():
+    ranks = dashboard.build_rank_tables(province_frame())
+    crime = ranks['provinces'].xs('Tindak Pidana 2023', level='metric')
+    # The national row is never ranked, lower crime ranks first and ties share the better rank
+    assert crime.index.tolist() == [1, 2, 3, 4]
+    assert crime['national_rank'].tolist() == [2, 3, 3, 1]
+    assert crime['national_total'].tolist() == [4, 4, 4, 4]
+    assert crime['region_rank'].tolist() == [1, 2, 2, 1]
+    # Higher is better for school completion; provinces without a value are left out
+    schooling = ranks['provinces'].xs('SMA_2023', level='metric')
+    assert schooling['national_rank'].to_dict() == {1: 3, 2: 2, 3: 1}
+    assert schooling['national_total'].tolist() == [3, 3, 3]
+    regions = ranks['regions'].xs('Tindak Pidana 2023', level='metric')
+    assert regions['value'].to_dict() == {'A': 20.0, 'B': 17.5}
+    assert regions['rank'].to_dict() == {'A': 2, 'B': 1}
+
+
+def test_snapshot_table_round_trip(tmp_path):
+    df = province_frame()
+    dashboard.write_snapshot_table('provinces', df, 'hash-a', snapshot_dir=tmp_path)
+    pd.testing.assert_frame_equal(dashboard.read_snapshot_table('provinces', 'hash-a', snapshot_dir=tmp_path), df)
+    # A snapshot built from other sources, or a missing one, is never returned
+    assert dashboard.read_snapshot_table('provinces', 'hash-b', snapshot_dir=tmp_path) is None
+    assert dashboard.read_snapshot_table('missing', 'hash-a', snapshot_dir=tmp_path) is None
+    # No temp files are left next to the snapshot
+    assert sorted(os.listdir(tmp_path)) == ['provinces.arrow', 'provinces.json']
+
+def test_file_store_appends_and_dedupes(tmp_path):
+    source_dir = tmp_path / "sources"
+    source_dir.mkdir()
+    def write_source(name, rows):
+        path = source_dir / name
+        pd.DataFrame(rows, columns=['province_id', 'Tahun', 'rate']).to_csv(path, index=False)
+        return str(path)
+    reads = []
+    def read_file(path):
+        reads.append(os.path.basename(path))
+        return pd.read_csv(path)
+    def update(sources):
+        reads.clear()
+        store = dashboard.update_file_store(
+            sources, read_file, "store.arrow", "store.json", snapshot_dir=str(tmp_path), key=['province_id', 'Tahun']
+        )
+        return store.sort_values(['province_id', 'Tahun']).reset_index(drop=True)
+
+    sources = {
+        'a': write_source('a.csv', [(1, 2020, 1.0), (1, 2021, 2.0)]),
+        # A revised file republishing 2021; the later file wins
+        'b': write_source('b.csv', [(1, 2021, 2.5), (1, 2022, 3.0)]),
+    }
+    store = update(sources)
+    assert store['rate'].tolist() == [1.0, 2.5, 3.0]
+    assert sorted(reads) == ['a.csv', 'b.csv']
+
+    # A new file is appended without re-reading the ingested ones
+    sources['c'] = write_source('c.csv', [(1, 2023, 4.0)])
+    store = update(sources)
+    assert store['Tahun'].tolist() == [2020, 2021, 2022, 2023]
+    assert reads == ['c.csv']
+    assert update(sources)['rate'].tolist() == [1.0, 2.5, 3.0, 4.0] and reads == []
+
+    # Removing the revision brings back the rows it shadowed
+    del sources['b']
+    store = update(sources)
+    assert store[['Tahun', 'rate']].values.tolist() == [[2020, 1.0], [2021, 2.0], [2023, 4.0]]
+
+def test_parse_bps_numbers_formats():
+    df = pd.DataFrame({
+        'space': ['2 294 901', '12 000', '-'],
+        'us': ['1,368.50', '2.5', ''],
+        'eu': ['1.368,50', '7', '...'],
+        'comma': ['6,89', '12', 'NA'],
+        'broken': ['1', 'x', None],
+    })
+    parsed, report = dashboard.parse_bps_numbers(df)
+    assert parsed['space'].tolist()[:2] == [2294901.0, 12000.0]
+    assert parsed['us'].tolist()[:2] == [1368.5, 2.5]
+    assert parsed['eu'].tolist()[:2] == [1368.5, 7.0]
+    assert parsed['comma'].tolist()[:2] == [6.89, 12.0]
+    # No-data markers become NaN silently; cells that do not parse are reported
+    assert parsed.iloc[2].isna().all()
+    assert report[['column', 'row', 'value']].values.tolist() == [['broken', 1, 'x']]
+
+def test_read_dataset_rejects_schema_drift(tmp_path):
+    path = tmp_path / "gini.csv"
+    path.write_text("Provinsi,2023\nACEH,0.296\n", encoding="utf-8")
+    df = dashboard.read_dataset('gini_ratio', path=str(path))
+    assert df.columns.tolist() == ['Provinsi', 'gini_ratio_2023']
+    # A renamed column and a value that no longer fits its dtype both fail the read
+    path.write_text("Provinsi,2024\nACEH,0.296\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=r"Schema drift in gini\.csv: missing columns \['2023'\]"):
+        dashboard.read_dataset('gini_ratio', path=str(path))
+    path.write_text("Provinsi,2023\nACEH,tinggi\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Schema drift in gini.csv"):
+        dashboard.read_dataset('gini_ratio', path=str(path))
+
+def test_require_data_version_detects_changed_sources(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dataset").mkdir()
+    source = tmp_path / "dataset" / "Penduduk.csv"
+    source.write_text("Provinsi,Jumlah Penduduk (Ribu)\nACEH,5482.5\n", encoding="utf-8")
+    fingerprints = {}
+    monkeypatch.setattr(dashboard, 'data_version_fingerprints', lambda: fingerprints)
+    dashboard.record_data_version('v1', dashboard.source_fingerprint())
+    dashboard.require_data_version('v1')
+    # Files replaced after v1 was published make its loaders fail instead of caching new data under v1
+    source.write_text("Provinsi,Jumlah Penduduk (Ribu)\nACEH,5554.8\nBALI,4433.3\n", encoding="utf-8")
+    with pytest.raises(dashboard.StaleDataVersionError):
+        dashboard.require_data_version('v1')
+    # Versions that were never published are not checked
+    dashboard.require_data_version('unpublished')
+    dashboard.require_data_version(None)
+
+def test_aggregate_csv_matches_groupby(tmp_path, monkeypatch):
+    name = 'tindak_pidana_kabupaten_bulanan'
+    schema = dashboard.DATASET_SCHEMAS[name]
+    rng = np.random.default_rng(0)
+    rows = 2000
+    df = pd.DataFrame({
+        'Kode Wilayah': rng.integers(1101, 1110, rows).astype(str),
+        'Kabupaten/Kota': 'KAB',
+        'Provinsi': rng.choice(['ACEH', 'BALI', 'RIAU'], rows),
+        'Tahun': rng.integers(2021, 2024, rows),
+        'Bulan': rng.integers(1, 13, rows),
+        'Jumlah Tindak Pidana': rng.integers(0, 500, rows).astype(float),
+        'Jumlah Penduduk': rng.integers(10_000, 90_000, rows).astype(float),
+    })
+    # Unreported months are published as '-'
+    df['Jumlah Tindak Pidana'] = df['Jumlah Tindak Pidana'].astype(object)
+    df.loc[::7, 'Jumlah Tindak Pidana'] = '-'
+    path = str(tmp_path / "monthly.csv")
+    df.to_csv(path, index=False)
+
+    keys, values = ['Provinsi', 'Tahun'], ['Jumlah Tindak Pidana', 'Jumlah Penduduk']
+    expected = (
+        pd.read_csv(path, dtype=schema['dtype'], na_values=schema['na_values'])
+        .groupby(keys, as_index=False)[values].sum()
+    )
+    def normalized(result):
+        result = result.astype({col: schema['dtype'][col] for col in keys + values})
+        return result.sort_values(keys, ignore_index=True)[keys + values]
+    # Small blocks so the streamed sums are folded across many batches
+    monkeypatch.setattr(dashboard, 'INGEST_BLOCK_BYTES', 4096)
+    pd.testing.assert_frame_equal(normalized(dashboard.aggregate_csv_streaming(schema, path, keys, values)), expected)
+    pd.testing.assert_frame_equal(normalized(dashboard.aggregate_csv(name, path, keys, values)), expected)
+    if dashboard.duckdb is not None:
+        pd.testing.assert_frame_equal(normalized(dashboard.aggregate_csv_duckdb(schema, path, keys, values)), expected)
+
+def test_rank_oc_index_ties_and_peer_groups():
+    df_oc = pd.DataFrame({
+        'Tahun': [2023] * 5 + [2021],
+        'Continent': pd.Categorical(['Asia', 'Asia', 'Asia', 'Europe', 'Asia', 'Asia']),
+        'Region': pd.Categorical(['South-Eastern Asia'] * 3 + ['Western Europe', 'Eastern Asia', 'South-Eastern Asia']),
+        'Country': ['Indonesia', 'Malaysia', 'Myanmar', 'France', 'Japan', 'Indonesia'],
+        'Criminality': [6.85, 5.0, 6.85, 5.5, 4.0, 6.38],
+    })
+    ranks = dashboard.rank_oc_index(df_oc)
+    # Higher criminality ranks first and ties share the better rank
+    assert ranks['World_Rank'].tolist() == [1, 4, 1, 3, 5, 1]
+    assert ranks['World_Total'].tolist() == [5, 5, 5, 5, 5, 1]
+    assert ranks['Continent_Rank'].tolist() == [1, 3, 1, 1, 4, 1]
+    assert ranks['Region_Total'].tolist() == [3, 3, 3, 1, 1, 1]
+    # Only members of a peer group get a rank within it
+    assert ranks['ASEAN_Rank'].tolist() == [1, 3, 1, pd.NA, pd.NA, 1]
+    assert ranks['ASEAN_Total'].isna().tolist() == [False, False, False, True, True, False]
+    assert ranks['ASEAN_Total'].dropna().tolist() == [3, 3, 3, 1]
+
+def test_world_crime_rows_keeps_order_and_skips_unknown_codes():
+    df = pd.DataFrame({
+        'Country Name': ['Indonesia', 'Malaysia', 'Singapore', None],
+        'Country Code': ['IDN', 'MYS', 'SGP', None],
+        '2022': [1.5, 2.0, np.nan, 9.0],
+        '2023': [1.0, 2.5, 0.5, 9.0],
+    })
+    matrix = dashboard.build_world_crime_matrix(df)
+    assert matrix['years'].tolist() == [2022, 2023]
+    assert matrix['values'].dtype == np.float32
+    codes, names, values = dashboard.world_crime_rows(matrix, ['SGP', 'XXX', 'IDN'])
+    assert codes.tolist() == ['SGP', 'IDN']
+    assert names.tolist() == ['Singapore', 'Indonesia']
+    np.testing.assert_array_equal(values, np.array([[np.nan, 0.5], [1.5, 1.0]], dtype=np.float32))
+
+def decode_topology_rings(topology, arcs):
+    """Absolute grid coordinates of every ring, stitched from delta-encoded arcs"""
+    points = [np.cumsum(np.asarray(arc), axis=0).tolist() for arc in topology['arcs']]
+    ring = []
+    for index in arcs:
+        arc = points[index] if index >= 0 else points[~index][::-1]
+        ring += arc if not ring else arc[1:]
+    return ring
+
+def test_topology_round_trip_shares_borders():
+    left = shapely.geometry.box(0, 0, 1, 1)
+    right = shapely.geometry.box(1, 0, 2, 1)
+    topology = dashboard.encode_topology(
+        np.array([left, right]), [{'province_id': 1}, {'province_id': 2}], quantization=3
+    )
+    geometries = topology['objects'][dashboard.TOPOLOGY_OBJECT]['geometries']
+    assert [geometry['properties'] for geometry in geometries] == [{'province_id': 1}, {'province_id': 2}]
+    # The common border is one arc, referenced forwards by one province and reversed by the other
+    assert len(topology['arcs']) == 3
+    refs = [set(geometry['arcs'][0]) for geometry in geometries]
+    shared = refs[0] & {~index for index in refs[1]} or refs[1] & {~index for index in refs[0]}
+    assert len(shared) == 1
+    scale = np.array(topology['transform']['scale'])
+    translate = np.array(topology['transform']['translate'])
+    for geometry, original in zip(geometries, [left, right]):
+        ring = np.asarray(decode_topology_rings(topology, geometry['arcs'][0])) * scale + translate
+        assert shapely.geometry.Polygon(ring).equals(original)
+
+def test_superseded_versions_keep_current_and_newest():
+    published = {'a': 1.0, 'b': 3.0, 'c': 2.0, 'd': 4.0}
+    assert dashboard.superseded_versions(published, 'a') == ['b', 'c']
+    assert dashboard.superseded_versions(published, 'd') == ['c', 'a']
+    assert dashboard.superseded_versions(published, 'new', keep=3) == ['c', 'a']
+    assert dashboard.superseded_versions({'a': 1.0}, 'a') == []
+
+def test_publish_map_geometry_prunes_superseded_versions(tmp_path):
+    levels = {'national': '{"type": "Topology"}', 'province': '{"type": "Topology"}'}
+    for published, version in enumerate(['v1', 'v2', 'v3']):
+        urls = dashboard.publish_map_geometry(levels, version, geometry_dir=str(tmp_path))
+        for path in tmp_path.glob(f"{version}-*.json"):
+            os.utime(path, (published, published))
+    assert urls == {'national': 'geometry/v3-national.json', 'province': 'geometry/v3-province.json'}
+    # Publishing v3 keeps it and the previous version, which open sessions may still be showing
+    assert sorted(os.listdir(tmp_path)) == ['v2-national.json', 'v2-province.json', 'v3-national.json', 'v3-province.json']
+    assert (tmp_path / 'v3-national.json').read_text() == levels['national']
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        value |= (byte & 0x7F) << shift
+        pos += 1
+        shift += 7
+        if byte < 0x80:
+            return value, pos
+
+def read_fields(data):
+    """(field number, value) pairs of a protobuf message; length-delimited values as bytes"""
+    fields = []
+    pos = 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        if key & 7 == 0:
+            value, pos = read_varint(data, pos)
+        else:
+            length, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        fields.append((key >> 3, value))
+    return fields
+
+def read_packed(data):
+    values = []
+    pos = 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+    return values
+
+def decode_polygon_commands(commands):
+    """Rings of MVT polygon geometry commands, in tile units"""
+    rings = []
+    cursor = np.zeros(2, dtype=np.int64)
+    i = 0
+    while i < len(commands):
+        command, count = commands[i] & 7, commands[i] >> 3
+        i += 1
+        if command == 7:
+            continue
+        for _ in range(count):
+            delta = np.array([(value >> 1) ^ -(value & 1) for value in commands[i:i + 2]])
+            cursor = cursor + delta
+            i += 2
+            if command == 1:
+                rings.append([])
+            rings[-1].append(cursor.tolist())
+    return rings
+
+def test_vector_tile_round_trip():
+    square = shapely.geometry.box(100, 100, 300, 400)
+    tile = dashboard.encode_vector_tile([(7, [square]), (8, [shapely.geometry.box(0, 0, 0.2, 0.2)])])
+    [(layer_number, layer)] = read_fields(tile)
+    assert layer_number == 3
+    layer = read_fields(layer)
+    assert (15, 2) in layer and (5, dashboard.VECTOR_TILE_EXTENT) in layer
+    assert dict(layer)[1] == dashboard.TOPOLOGY_OBJECT.encode("utf-8")
+    # The second province collapses below one tile unit, so only the first is encoded
+    features = [read_fields(value) for number, value in layer if number == 2]
+    assert len(features) == 1
+    feature = dict(features[0])
+    assert feature[1] == 7 and feature[3] == 3
+    keys = [value for number, value in layer if number == 3]
+    values = [read_fields(value) for number, value in layer if number == 4]
+    key_index, value_index = read_packed(feature[2])
+    assert keys[key_index] == b"province_id" and values[value_index] == [(5, 7)]
+    [ring] = decode_polygon_commands(read_packed(feature[4]))
+    decoded = shapely.geometry.Polygon(ring)
+    assert decoded.equals(square)
+    # Exterior rings wind with positive area in tile coordinates
+    assert shapely.geometry.polygon.orient(decoded, sign=1.0).exterior.coords[:] == decoded.exterior.coords[:]
+
+def test_build_vector_tiles_reuses_and_prunes_versions(tmp_path):
+    for published, version in enumerate(['old', 'previous', 'current'], start=1):
+        (tmp_path / version).mkdir()
+        manifest = tmp_path / version / "tiles.json"
+        manifest.write_text('{"tiles": {}}')
+        os.utime(manifest, (published, published))
+    # An interrupted build has no manifest and counts as the oldest version
+    (tmp_path / "unfinished" / "4").mkdir(parents=True)
+    # A finished build is reused as is, so no geometry is loaded here
+    assert dashboard.build_vector_tiles('current', tile_dir=str(tmp_path)) == "tiles/current/{z}/{x}/{y}.pbf"
+    assert sorted(os.listdir(tmp_path)) == ['current', 'previous']
+
+def test_aggregate_cube_states():
+    df = province_frame()
+    states = [('Semua', 'Semua'), ('A', 'Semua'), ('Semua', 'P3'), ('B', 'P3'), ('A', 'P3')]
+    cube = dashboard.build_aggregate_cube(df, dashboard.build_rank_tables(df), states)
+    national = cube[('Semua', 'Semua')]
+    assert national['count'] == 4
+    assert national['current'] == 18.75
+    # Top provinces by crime rate, ties kept in province order
+    assert national['top']['Provinsi'].tolist() == ['P2', 'P3', 'P1', 'P4']
+    region = cube[('A', 'Semua')]
+    assert (region['count'], region['current'], region['previous']) == (2, 20.0, 20.0)
+    assert region['ranks']['rank'] == 2
+    province = cube[('B', 'P3')]
+    assert (province['current'], province['previous'], province['region']) == (30.0, 40.0, 'B')
+    assert province['ranks']['national_rank'] == 3
+    # A province outside the selected region has no entry
+    assert ('A', 'P3') not in cube
+    assert dashboard.aggregate_for(cube, 'A', 'P3') is dashboard.EMPTY_AGGREGATE